@@ -61,7 +61,13 @@ def run_migrations_offline():
 
 
 def do_run_migrations(connection):
-    context.configure(connection=connection, target_metadata=target_metadata)
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        # SQLite не поддерживает ALTER для ограничений: автогенерация
+        # для неё должна использовать batch-режим, PostgreSQL — нет.
+        render_as_batch=connection.dialect.name == 'sqlite',
+    )
 
     with context.begin_transaction():
         context.run_migrations()
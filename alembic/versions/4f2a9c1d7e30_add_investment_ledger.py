@@ -0,0 +1,51 @@
+"""Add investment ledger
+
+Revision ID: 4f2a9c1d7e30
+Revises: cb64eb5eb105
+Create Date: 2026-10-18 21:05:37.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4f2a9c1d7e30'
+down_revision = 'cb64eb5eb105'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'investment',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('donation_id', sa.Integer(), nullable=False),
+        sa.Column('project_id', sa.Integer(), nullable=False),
+        sa.Column('amount', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.CheckConstraint(
+            'amount > 0', name='ck_investment_amount_positive'
+        ),
+        sa.ForeignKeyConstraint(['donation_id'], ['donation.id'], ),
+        sa.ForeignKeyConstraint(['project_id'], ['charityproject.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(
+        'ix_investment_donation',
+        'investment',
+        ['donation_id', 'id', 'project_id', 'amount', 'created_at'],
+        unique=False,
+    )
+    op.create_index(
+        'ix_investment_project',
+        'investment',
+        ['project_id', 'id', 'donation_id', 'amount', 'created_at'],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index('ix_investment_project', table_name='investment')
+    op.drop_index('ix_investment_donation', table_name='investment')
+    op.drop_table('investment')
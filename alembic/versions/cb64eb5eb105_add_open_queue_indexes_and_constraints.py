@@ -0,0 +1,67 @@
+"""Add open queue indexes and BaseDonation constraints
+
+Revision ID: cb64eb5eb105
+Revises: 768feeebad3a
+Create Date: 2026-10-18 17:24:12.449578
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'cb64eb5eb105'
+down_revision = '768feeebad3a'
+branch_labels = None
+depends_on = None
+
+TABLES = ('charityproject', 'donation')
+
+
+def upgrade():
+    for table in TABLES:
+        op.execute(
+            f'UPDATE {table} SET invested_amount = 0 '
+            'WHERE invested_amount IS NULL'
+        )
+        # SQLite не умеет ALTER ... ADD CONSTRAINT: batch-режим
+        # пересоздаёт таблицу с новыми ограничениями.
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column(
+                'invested_amount',
+                existing_type=sa.Integer(),
+                nullable=False,
+            )
+            batch_op.create_check_constraint(
+                f'ck_{table}_full_amount_positive',
+                'full_amount > 0',
+            )
+            batch_op.create_check_constraint(
+                f'ck_{table}_invested_not_above_full',
+                'full_amount >= invested_amount',
+            )
+        op.create_index(
+            f'ix_{table}_open',
+            table,
+            ['id'],
+            unique=False,
+            sqlite_where=sa.text('fully_invested = 0'),
+            postgresql_where=sa.text('fully_invested = false'),
+        )
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        op.drop_index(f'ix_{table}_open', table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_constraint(
+                f'ck_{table}_invested_not_above_full', type_='check'
+            )
+            batch_op.drop_constraint(
+                f'ck_{table}_full_amount_positive', type_='check'
+            )
+            batch_op.alter_column(
+                'invested_amount',
+                existing_type=sa.Integer(),
+                nullable=True,
+            )
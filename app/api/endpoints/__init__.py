@@ -1,3 +1,4 @@
 from .user import router as user_router # noqa
 from .charity_projects import router as project_router # noqa
-from .donation import router as donation_router # noqa
\ No newline at end of file
+from .donation import router as donation_router # noqa
+from .traces import router as trace_router # noqa
@@ -1,21 +1,29 @@
 from datetime import datetime
+from typing import Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.export import ExportFormat, export_response
+from app.api.pagination import ListParams, PageParams, paginate
+from app.api.responses import RowsResponse
 from app.api.validators import (
-    check_project_name_duplicate, check_charity_project_exists,
-    check_project_invested, check_project_new_full_amount,
-    check_project_is_closed
+    check_batch_size, check_project_name_duplicate,
+    check_charity_project_exists, get_project_names_batch_errors,
+    raise_project_remove_error, raise_project_update_error
 )
-from app.core.db import get_async_session
+from app.core.db import get_async_session, get_read_session
 from app.core.user import current_superuser
 from app.crud.charity_project import charity_project_crud
 from app.crud.donation import donation_crud
-from app.crud.invest import invest
+from app.crud.funding_book import funding_book
+from app.crud.investment import investment_crud
 from app.schemas.charity_project import (
-    CharityProjectCreate, CharityProjectDB, CharityProjectUpdate
+    CharityProjectBatchError, CharityProjectBatchResult, CharityProjectCreate,
+    CharityProjectDB, CharityProjectUpdate
 )
+from app.schemas.investment import ProjectFunder
 
 
 router = APIRouter()
@@ -26,13 +34,74 @@ router = APIRouter()
     response_model=list[CharityProjectDB]
 )
 async def get_all_charity_projects(
-    session: AsyncSession = Depends(get_async_session),
+    request: Request,
+    params: ListParams = Depends(),
+    session: AsyncSession = Depends(get_read_session),
+):
+    '''
+    Возвращает список проектов постранично (по **limit** штук).
+
+    Следующая страница запрашивается с **after**, равным заголовку
+    X-Next-Cursor; **all=true** возвращает все проекты сразу.
+    Фильтры: **fully_invested**, **created_from**, **created_to**.
+    '''
+    fields = list(CharityProjectDB.__fields__)
+    all_projects = await charity_project_crud.get_multi_rows(
+        fields, session, params.query_limit, params.after, **params.filters
+    )
+    all_projects, headers = paginate(all_projects, params, request)
+    return RowsResponse(all_projects, fields, headers=headers)
+
+
+@router.get(
+    '/export',
+    dependencies=[Depends(current_superuser)]
+)
+async def export_charity_projects(
+    export_format: ExportFormat = ExportFormat.ndjson,
+    gzip: bool = False,
+    fully_invested: Optional[bool] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    session: AsyncSession = Depends(get_read_session),
 ):
     '''
-    Возвращает список всех проектов.
+    Выгружает проекты потоком в формате NDJSON или CSV
+    (**export_format**), при **gzip=true** — со сжатием.
     '''
-    all_projects = await charity_project_crud.get_multi(session)
-    return all_projects
+    fields = list(CharityProjectDB.__fields__)
+    result = await charity_project_crud.stream_multi(
+        fields,
+        session,
+        fully_invested=fully_invested,
+        created_from=created_from,
+        created_to=created_to,
+    )
+    return export_response(result, fields, export_format, gzip, 'projects')
+
+
+@router.get(
+    '/{project_id}/funders',
+    response_model=list[ProjectFunder],
+    dependencies=[Depends(current_superuser)]
+)
+async def get_project_funders(
+    project_id: int,
+    request: Request,
+    params: PageParams = Depends(),
+    session: AsyncSession = Depends(get_read_session),
+):
+    '''
+    Возвращает, из каких пожертвований и сколько вложено в проект,
+    постранично по **limit** записей журнала (курсор **after**).
+    '''
+    await check_charity_project_exists(project_id, session)
+    fields = list(ProjectFunder.__fields__)
+    funders = await investment_crud.get_project_funders(
+        project_id, fields, session, params.query_limit, params.after
+    )
+    funders, headers = paginate(funders, params, request)
+    return RowsResponse(funders, fields, headers=headers)
 
 
 @router.post(
@@ -53,24 +122,66 @@ async def create_new_charity_project(
     - **full_amount**: требуемая сумма
     '''
     await check_project_name_duplicate(charity_project.name, session)
-    donations_to_invest = await donation_crud.get_objects_to_invest(session)
     new_project = await charity_project_crud.create(
         charity_project,
         session,
-        need_to_invest=bool(donations_to_invest)
+        need_to_invest=True
     )
-    if donations_to_invest:
-        new_project, changed_donations = invest(
-            new_project, donations_to_invest
-        )
-        for donation in changed_donations:
-            session.add(donation)
-    session.add(new_project)
-    await session.commit()
-    await session.refresh(new_project)
+    changed_donations = await donation_crud.invest_into(
+        [new_project], session
+    )
+    await funding_book.commit(session, new_project)
+    funding_book.sync_entries(donation_crud.model, changed_donations)
     return new_project
 
 
+@router.post(
+    '/batch',
+    response_model=CharityProjectBatchResult,
+    dependencies=[Depends(current_superuser)]
+)
+async def create_charity_projects_batch(
+        charity_projects: list[CharityProjectCreate],
+        session: AsyncSession = Depends(get_async_session),
+):
+    '''
+    Создаёт несколько благотворительных проектов за один запрос.
+
+    Проекты с занятыми названиями не создаются и попадают в **errors**,
+    остальные создаются и получают свободные пожертвования
+    в порядке следования.
+    '''
+    await check_batch_size(charity_projects)
+    errors = await get_project_names_batch_errors(charity_projects, session)
+    new_projects = [
+        await charity_project_crud.create(
+            charity_project, session, need_to_invest=True
+        )
+        for index, charity_project in enumerate(charity_projects)
+        if index not in errors
+    ]
+    created = []
+    if new_projects:
+        changed_donations = await donation_crud.invest_into(
+            new_projects, session
+        )
+        created = [
+            CharityProjectDB.from_orm(new_project)
+            for new_project in new_projects
+        ]
+        await funding_book.commit(session, *new_projects)
+        funding_book.sync_entries(donation_crud.model, changed_donations)
+    return CharityProjectBatchResult(
+        created=created,
+        errors=[
+            CharityProjectBatchError(
+                index=index, name=charity_projects[index].name, detail=detail
+            )
+            for index, detail in errors.items()
+        ]
+    )
+
+
 @router.delete(
     '/{project_id}',
     response_model=CharityProjectDB,
@@ -84,14 +195,12 @@ async def remove_meeting_room(
     '''
     Удаляет благотворительный проект
     '''
-    charity_project = await check_charity_project_exists(
+    charity_project = await charity_project_crud.remove_unfunded_project(
         project_id, session
     )
-    await check_project_invested(charity_project)
-    await check_project_is_closed(charity_project)
-    charity_project = await charity_project_crud.remove(
-        charity_project, session
-    )
+    if charity_project is None:
+        await raise_project_remove_error(project_id, session)
+    funding_book.discard(charity_project)
     return charity_project
 
 
@@ -112,21 +221,27 @@ async def partially_update_charity_project(
     - **name**: уникальное название проекта
     - **description**: описание проекта
     - **full_amount**: требуемая сумма
+
+    Если требуемая сумма увеличена, в проект сразу распределяются
+    свободные пожертвования.
     '''
-    charity_project = await check_charity_project_exists(
-        project_id, session
-    )
-    if obj_in.full_amount:
-        await check_project_new_full_amount(
-            charity_project, obj_in.full_amount
+    try:
+        charity_project = await charity_project_crud.update_open_project(
+            project_id, obj_in, session
         )
-    await check_project_is_closed(charity_project)
-    if obj_in.name is not None:
-        await check_project_name_duplicate(obj_in.name, session)
-    if obj_in.full_amount == charity_project.invested_amount:
-        charity_project.fully_invested = True
-        charity_project.close_date = datetime.now()
-    charity_project = await charity_project_crud.update(
-        charity_project, obj_in, session
-    )
-    return charity_project
+    except IntegrityError:
+        await session.rollback()
+        if obj_in.name is not None:
+            await check_project_name_duplicate(obj_in.name, session)
+        raise
+    if charity_project is None:
+        await raise_project_update_error(project_id, obj_in, session)
+    changed_donations = []
+    if obj_in.full_amount is not None and not charity_project.fully_invested:
+        changed_donations = await donation_crud.invest_into(
+            [charity_project], session
+        )
+    updated = CharityProjectDB.from_orm(charity_project)
+    await funding_book.commit(session, charity_project)
+    funding_book.sync_entries(donation_crud.model, changed_donations)
+    return updated
@@ -1,15 +1,26 @@
-from fastapi import APIRouter, Depends
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.db import get_async_session
+from app.api.export import ExportFormat, export_response
+from app.api.pagination import ListParams, PageParams, paginate
+from app.api.responses import RowsResponse
+from app.api.validators import check_donation_access, parse_donations_batch
+from app.constants import NDJSON_MEDIA_TYPE
+from app.core.db import get_async_session, get_read_session
 from app.core.user import current_superuser, current_user
 from app.crud.charity_project import charity_project_crud
 from app.crud.donation import donation_crud
-from app.crud.invest import invest
+from app.crud.donation_writer import donation_writer
+from app.crud.funding_book import funding_book
+from app.crud.investment import investment_crud
 from app.models import User
 from app.schemas.donation import (
-    DonationBase, DonationDB, DonationCreate
+    DonationBase, DonationDB, DonationCreate, DonationWriterStats
 )
+from app.schemas.investment import DonationAllocation
 
 
 router = APIRouter()
@@ -21,13 +32,55 @@ router = APIRouter()
     dependencies=[Depends(current_superuser)]
 )
 async def get_all_donations(
-    session: AsyncSession = Depends(get_async_session),
+    request: Request,
+    params: ListParams = Depends(),
+    user_id: Optional[int] = None,
+    session: AsyncSession = Depends(get_read_session),
+):
+    '''
+    Возвращает список пожертвований постранично (по **limit** штук).
+
+    Следующая страница запрашивается с **after**, равным заголовку
+    X-Next-Cursor; **all=true** возвращает все пожертвования сразу.
+    Фильтры: **user_id**, **fully_invested**, **created_from**,
+    **created_to**.
+    '''
+    fields = list(DonationDB.__fields__)
+    donations = await donation_crud.get_multi_rows(
+        fields, session, params.query_limit, params.after,
+        user_id=user_id, **params.filters
+    )
+    donations, headers = paginate(donations, params, request)
+    return RowsResponse(donations, fields, headers=headers)
+
+
+@router.get(
+    '/export',
+    dependencies=[Depends(current_superuser)]
+)
+async def export_donations(
+    export_format: ExportFormat = ExportFormat.ndjson,
+    gzip: bool = False,
+    user_id: Optional[int] = None,
+    fully_invested: Optional[bool] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    session: AsyncSession = Depends(get_read_session),
 ):
     '''
-    Возвращает список всех пожертвований.
+    Выгружает пожертвования потоком в формате NDJSON или CSV
+    (**export_format**), при **gzip=true** — со сжатием.
     '''
-    donations = await donation_crud.get_multi(session)
-    return donations
+    fields = list(DonationDB.__fields__)
+    result = await donation_crud.stream_multi(
+        fields,
+        session,
+        user_id=user_id,
+        fully_invested=fully_invested,
+        created_from=created_from,
+        created_to=created_to,
+    )
+    return export_response(result, fields, export_format, gzip, 'donations')
 
 
 @router.post(
@@ -46,39 +99,121 @@ async def create_new_donation(
     - **full_amount**: сумма пожертвования
     - **comment**: комментарий
     '''
-    projects_to_invest = await charity_project_crud.get_objects_to_invest(
-        session
-    )
+    if donation_writer.running:
+        return await donation_writer.submit(donation, user)
     new_donation = await donation_crud.create(
         donation,
         session,
         user,
-        bool(projects_to_invest)
+        need_to_invest=True
     )
-    if projects_to_invest:
-        new_donation, changed_projects = invest(
-            new_donation,
-            projects_to_invest
-        )
-        for project in changed_projects:
-            session.add(project)
-    session.add(new_donation)
-    await session.commit()
-    await session.refresh(new_donation)
+    changed_projects = await charity_project_crud.invest_into(
+        [new_donation], session
+    )
+    await funding_book.commit(session, new_donation)
+    funding_book.sync_entries(charity_project_crud.model, changed_projects)
     return new_donation
 
 
+@router.post(
+    '/batch',
+    response_model=list[DonationCreate],
+    response_model_exclude_none=True,
+    openapi_extra={
+        'requestBody': {
+            'required': True,
+            'content': {
+                media_type: {
+                    'schema': {
+                        'type': 'array',
+                        'items': {'$ref': '#/components/schemas/DonationBase'}
+                    }
+                }
+                for media_type in ('application/json', NDJSON_MEDIA_TYPE)
+            },
+        }
+    }
+)
+async def create_donations_batch(
+        donations: list[DonationBase] = Depends(parse_donations_batch),
+        session: AsyncSession = Depends(get_async_session),
+        user: User = Depends(current_user)
+):
+    '''
+    Сделать несколько пожертвований за один запрос.
+
+    Принимает JSON-массив или NDJSON (по одному пожертвованию в строке)
+    с полями **full_amount** и **comment**. Пожертвования распределяются
+    по открытым проектам в порядке следования, как при отправке по одному.
+    '''
+    new_donations, changed_projects = await donation_crud.create_invested(
+        donations, [user] * len(donations), session
+    )
+    created = [
+        DonationCreate.from_orm(new_donation) for new_donation in new_donations
+    ]
+    await funding_book.commit(session, *new_donations)
+    funding_book.sync_entries(charity_project_crud.model, changed_projects)
+    return created
+
+
 @router.get(
     '/my',
     response_model=list[DonationCreate],
     dependencies=[Depends(current_user)]
 )
 async def get_my_donations(
+    request: Request,
+    params: ListParams = Depends(),
+    user: User = Depends(current_user),
+    session: AsyncSession = Depends(get_read_session)
+):
+    '''
+    Возвращает список пожертвований пользователя, выполняющего запрос,
+    постранично — с теми же параметрами, что и список всех пожертвований.
+    '''
+    fields = list(DonationCreate.__fields__)
+    donations = await donation_crud.get_multi_rows(
+        fields, session, params.query_limit, params.after,
+        user_id=user.id, **params.filters
+    )
+    donations, headers = paginate(donations, params, request)
+    return RowsResponse(donations, fields, headers=headers)
+
+
+@router.get(
+    '/{donation_id}/allocations',
+    response_model=list[DonationAllocation],
+)
+async def get_donation_allocations(
+    donation_id: int,
+    request: Request,
+    params: PageParams = Depends(),
     user: User = Depends(current_user),
-    session: AsyncSession = Depends(get_async_session)
+    session: AsyncSession = Depends(get_read_session),
 ):
     '''
-    Возвращает список пожертвований пользователя, выполняющего запрос.
+    Возвращает, в какие проекты и сколько вложено из пожертвования,
+    постранично по **limit** записей журнала (курсор **after**).
+    Доступно автору пожертвования и суперпользователю.
+    '''
+    await check_donation_access(donation_id, user, session)
+    fields = list(DonationAllocation.__fields__)
+    allocations = await investment_crud.get_donation_allocations(
+        donation_id, fields, session, params.query_limit, params.after
+    )
+    allocations, headers = paginate(allocations, params, request)
+    return RowsResponse(allocations, fields, headers=headers)
+
+
+@router.get(
+    '/writer',
+    response_model=DonationWriterStats,
+    dependencies=[Depends(current_superuser)]
+)
+async def get_donation_writer_stats():
+    '''
+    Возвращает состояние групповой записи пожертвований:
+    глубину очереди и размеры пакетов.
     '''
-    donations = await donation_crud.get_donations_by_user(session, user)
-    return donations
+    return donation_writer.stats()
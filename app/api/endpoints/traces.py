@@ -0,0 +1,41 @@
+from enum import Enum
+
+from fastapi import APIRouter, Depends
+
+from app.core.tracing import traces
+from app.core.user import current_superuser
+
+
+class TraceFormat(str, Enum):
+    json = 'json'
+    chrome = 'chrome'
+
+
+router = APIRouter()
+
+
+@router.get(
+    '/',
+    dependencies=[Depends(current_superuser)]
+)
+async def get_traces(
+    trace_format: TraceFormat = TraceFormat.json,
+    limit: int = 100,
+):
+    '''
+    Возвращает последние **limit** трасс запросов из кольцевого буфера:
+    спаны зависимостей, обработчика, SQL-запросов и фаз запроса.
+    **trace_format=chrome** отдаёт их в формате Chrome Trace Event
+    (открывается в chrome://tracing или Perfetto).
+    '''
+    finished = list(traces)[-limit:] if limit > 0 else []
+    if trace_format == TraceFormat.chrome:
+        return {
+            'traceEvents': [
+                event
+                for trace in finished
+                for event in trace.chrome_events()
+            ],
+            'displayTimeUnit': 'ms',
+        }
+    return [trace.as_dict() for trace in finished]
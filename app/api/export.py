@@ -0,0 +1,90 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from enum import Enum
+from typing import AsyncIterator
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncResult
+
+from app.constants import EXPORT_CHUNK_SIZE, NDJSON_MEDIA_TYPE
+
+
+class ExportFormat(str, Enum):
+    ndjson = 'ndjson'
+    csv = 'csv'
+
+
+MEDIA_TYPES = {
+    ExportFormat.ndjson: NDJSON_MEDIA_TYPE,
+    ExportFormat.csv: 'text/csv',
+}
+
+
+def encode_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def ndjson_chunk(fields: list[str], rows) -> str:
+    return ''.join(
+        json.dumps(
+            dict(zip(fields, row)), ensure_ascii=False, default=encode_value
+        ) + '\n'
+        for row in rows
+    )
+
+
+def csv_chunk(rows) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(
+        [
+            value.isoformat() if isinstance(value, datetime) else value
+            for value in row
+        ]
+        for row in rows
+    )
+    return buffer.getvalue()
+
+
+async def encode_rows(
+    result: AsyncResult,
+    fields: list[str],
+    export_format: ExportFormat,
+    compress: bool,
+) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    if export_format == ExportFormat.csv:
+        header = csv_chunk([fields]).encode()
+        yield compressor.compress(header) if compress else header
+    async for rows in result.partitions(EXPORT_CHUNK_SIZE):
+        if export_format == ExportFormat.csv:
+            chunk = csv_chunk(rows).encode()
+        else:
+            chunk = ndjson_chunk(fields, rows).encode()
+        yield compressor.compress(chunk) if compress else chunk
+    if compress:
+        yield compressor.flush()
+
+
+def export_response(
+    result: AsyncResult,
+    fields: list[str],
+    export_format: ExportFormat,
+    compress: bool,
+    filename: str,
+) -> StreamingResponse:
+    headers = {
+        'Content-Disposition':
+            f'attachment; filename="{filename}.{export_format.value}"'
+    }
+    if compress:
+        headers['Content-Encoding'] = 'gzip'
+    return StreamingResponse(
+        encode_rows(result, fields, export_format, compress),
+        media_type=MEDIA_TYPES[export_format],
+        headers=headers,
+    )
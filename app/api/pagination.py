@@ -0,0 +1,78 @@
+from datetime import datetime
+from typing import Optional
+
+from fastapi import Query, Request
+
+from app.constants import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER
+
+
+LIMIT_QUERY = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+AFTER_QUERY = Query(
+    None, ge=0, description='id последнего объекта прошлой страницы'
+)
+ALL_QUERY = Query(
+    False, alias='all', description='Вернуть все объекты без страниц'
+)
+
+
+class PageParams:
+    '''Параметры постраничной (keyset по id) выдачи.'''
+
+    def __init__(
+        self,
+        limit: int = LIMIT_QUERY,
+        after: Optional[int] = AFTER_QUERY,
+        all_objects: bool = ALL_QUERY,
+    ):
+        self.limit = None if all_objects else limit
+        self.after = after
+
+    @property
+    def query_limit(self) -> Optional[int]:
+        '''Лимит запроса с одной лишней строкой для поиска курсора.'''
+        return None if self.limit is None else self.limit + 1
+
+
+class ListParams(PageParams):
+    '''Параметры постраничной выдачи и фильтры списков.'''
+
+    def __init__(
+        self,
+        limit: int = LIMIT_QUERY,
+        after: Optional[int] = AFTER_QUERY,
+        all_objects: bool = ALL_QUERY,
+        fully_invested: Optional[bool] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+    ):
+        super().__init__(limit, after, all_objects)
+        self.fully_invested = fully_invested
+        self.created_from = created_from
+        self.created_to = created_to
+
+    @property
+    def filters(self) -> dict:
+        return dict(
+            fully_invested=self.fully_invested,
+            created_from=self.created_from,
+            created_to=self.created_to,
+        )
+
+
+def paginate(
+    objs: list,
+    params: PageParams,
+    request: Request,
+) -> tuple[list, dict[str, str]]:
+    '''Обрезает лишнюю строку и возвращает заголовки со ссылкой дальше.'''
+    if params.limit is None or len(objs) <= params.limit:
+        return objs, {}
+    objs = objs[:params.limit]
+    cursor = objs[-1].id
+    next_url = request.url.include_query_params(
+        after=cursor, limit=params.limit
+    )
+    return objs, {
+        NEXT_CURSOR_HEADER: str(cursor),
+        'Link': f'<{next_url}>; rel="next"',
+    }
@@ -0,0 +1,17 @@
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class RowsResponse(JSONResponse):
+    '''
+    JSON-ответ из строк Core-запроса без ORM-объектов и pydantic-моделей.
+
+    Строки выбираются в порядке полей схемы ответа, поэтому тело совпадает
+    побайтно с тем, что FastAPI собрал бы через response_model.
+    '''
+
+    def __init__(self, rows, fields: list[str], **kwargs):
+        super().__init__([dict(zip(fields, row)) for row in rows], **kwargs)
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
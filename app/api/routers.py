@@ -1,7 +1,7 @@
 from fastapi import APIRouter
 
 from app.api.endpoints import (
-    user_router, project_router, donation_router
+    user_router, project_router, donation_router, trace_router
 )
 
 main_router = APIRouter()
@@ -15,4 +15,9 @@ main_router.include_router(
     donation_router,
     prefix='/donation',
     tags=['Donation']
+)
+main_router.include_router(
+    trace_router,
+    prefix='/traces',
+    tags=['Traces']
 )
\ No newline at end of file
@@ -1,10 +1,21 @@
 from http import HTTPStatus
 
-from fastapi import HTTPException
+from fastapi import HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError, parse_raw_as
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.constants import BATCH_MAX_SIZE, NDJSON_MEDIA_TYPE
 from app.crud.charity_project import charity_project_crud
-from app.models import CharityProject
+from app.crud.donation import donation_crud
+from app.models import CharityProject, Donation, User
+from app.schemas.charity_project import (
+    CharityProjectCreate, CharityProjectUpdate
+)
+from app.schemas.donation import DonationBase
+
+PROJECT_NAME_DUPLICATE = 'Проект с таким именем уже существует!'
+PROJECT_CHANGED = 'Проект изменён другим запросом, повторите попытку.'
 
 
 async def check_project_name_duplicate(
@@ -17,10 +28,25 @@ async def check_project_name_duplicate(
     if project_id is not None:
         raise HTTPException(
             status_code=HTTPStatus.BAD_REQUEST,
-            detail='Проект с таким именем уже существует!',
+            detail=PROJECT_NAME_DUPLICATE,
         )
 
 
+async def get_project_names_batch_errors(
+    projects: list[CharityProjectCreate],
+    session: AsyncSession,
+) -> dict[int, str]:
+    taken_names = await charity_project_crud.get_existing_names(
+        [project.name for project in projects], session
+    )
+    errors = {}
+    for index, project in enumerate(projects):
+        if project.name in taken_names:
+            errors[index] = PROJECT_NAME_DUPLICATE
+        taken_names.add(project.name)
+    return errors
+
+
 async def check_charity_project_exists(
         charity_project_id: int,
         session: AsyncSession,
@@ -36,6 +62,25 @@ async def check_charity_project_exists(
     return charity_project
 
 
+async def check_donation_access(
+        donation_id: int,
+        user: User,
+        session: AsyncSession,
+) -> Donation:
+    donation = await donation_crud.get(donation_id, session)
+    if donation is None:
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND,
+            detail='Пожертвование не найдено!'
+        )
+    if donation.user_id != user.id and not user.is_superuser:
+        raise HTTPException(
+            status_code=HTTPStatus.FORBIDDEN,
+            detail='Можно смотреть только свои пожертвования!'
+        )
+    return donation
+
+
 async def check_project_invested(
         charity_project: CharityProject
 ) -> None:
@@ -66,3 +111,65 @@ async def check_project_is_closed(
             status_code=HTTPStatus.BAD_REQUEST,
             detail='Закрытый проект нельзя редактировать!'
         )
+
+
+async def raise_project_remove_error(
+        charity_project_id: int,
+        session: AsyncSession,
+) -> None:
+    '''Выясняет, почему условный DELETE не удалил проект.'''
+    charity_project = await check_charity_project_exists(
+        charity_project_id, session
+    )
+    await check_project_invested(charity_project)
+    await check_project_is_closed(charity_project)
+    raise HTTPException(
+        status_code=HTTPStatus.CONFLICT,
+        detail=PROJECT_CHANGED,
+    )
+
+
+async def raise_project_update_error(
+        charity_project_id: int,
+        obj_in: CharityProjectUpdate,
+        session: AsyncSession,
+) -> None:
+    '''Выясняет, почему условный UPDATE не изменил проект.'''
+    charity_project = await check_charity_project_exists(
+        charity_project_id, session
+    )
+    if obj_in.full_amount:
+        await check_project_new_full_amount(
+            charity_project, obj_in.full_amount
+        )
+    await check_project_is_closed(charity_project)
+    raise HTTPException(
+        status_code=HTTPStatus.CONFLICT,
+        detail=PROJECT_CHANGED,
+    )
+
+
+async def parse_donations_batch(request: Request) -> list[DonationBase]:
+    body = await request.body()
+    content_type = request.headers.get('content-type', '')
+    try:
+        if content_type.startswith(NDJSON_MEDIA_TYPE):
+            donations = [
+                DonationBase.parse_raw(line)
+                for line in body.splitlines() if line.strip()
+            ]
+        else:
+            donations = parse_raw_as(list[DonationBase], body)
+    except ValidationError as error:
+        raise RequestValidationError(error.raw_errors)
+    await check_batch_size(donations)
+    return donations
+
+
+async def check_batch_size(items: list) -> None:
+    if not 0 < len(items) <= BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail=f'Пакет должен содержать от 1 до {BATCH_MAX_SIZE} '
+            'объектов.'
+        )
@@ -5,4 +5,11 @@ DEFAULT_SECRET = 'SECRET'
 SESSION_LIFETIME = 3600
 PROJECT_NAME_FIELD_MIN_LENGTH = 1
 PROJECT_NAME_FIELD_MAX_LENGTH = 100
-PROJECT_DESCRIPTION_FIELD_MIN_LENGTH = 1
\ No newline at end of file
+PROJECT_DESCRIPTION_FIELD_MIN_LENGTH = 1
+BATCH_MAX_SIZE = 1000
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+EXPORT_CHUNK_SIZE = 1000
+OPEN_SCAN_FIRST_CHUNK = 8
\ No newline at end of file
@@ -1,2 +1,2 @@
 from app.core.db import Base # noqa
-from app.models import CharityProject, Donation, User # noqa
\ No newline at end of file
+from app.models import CharityProject, Donation, Investment, User # noqa
\ No newline at end of file
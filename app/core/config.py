@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic import BaseSettings
 
 from app.constants import (
@@ -11,6 +13,40 @@ class Settings(BaseSettings):
     app_description: str = DEFAULT_APP_DESCRIPTION
     database_url: str = DEFAULT_DATABASE_URL
     secret: str = DEFAULT_SECRET
+    pool_size: int = 5
+    pool_max_overflow: int = 10
+    pool_timeout: float = 30
+    pool_recycle: int = 1800
+    pool_pre_ping: bool = False
+    allocation_skip_locked: bool = True
+    read_replica_url: Optional[str] = None
+    sqlite_read_only: bool = False
+    sqlite_tuning: bool = False
+    sqlite_journal_mode: str = 'WAL'
+    sqlite_synchronous: str = 'NORMAL'
+    sqlite_mmap_size: int = 268435456
+    sqlite_cache_size: int = -65536
+    sqlite_busy_timeout: int = 5000
+    sqlite_temp_store: str = 'MEMORY'
+    sql_instrumentation: bool = True
+    slow_query_ms: float = 200
+    metrics: bool = True
+    metrics_token: Optional[str] = None
+    profiling: bool = True
+    profile_dir: Optional[str] = None
+    profile_limit: int = 50
+    tracing: bool = False
+    trace_sample_rate: float = 0.01
+    trace_buffer_size: int = 1000
+    user_cache_ttl: float = 60
+    user_cache_size: int = 10000
+    password_workers: int = 4
+    password_max_pending: int = 64
+    password_use_processes: bool = False
+    funding_book: bool = False
+    donation_writer: bool = False
+    donation_writer_max_delay: float = 0.005
+    donation_writer_max_size: int = 200
 
     class Config:
         env_file = '.env'
@@ -1,8 +1,20 @@
-from sqlalchemy import Column, Integer
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import declarative_base, declared_attr, sessionmaker
+import asyncio
+from typing import Optional
+from weakref import WeakKeyDictionary
+
+from sqlalchemy import Column, Integer, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine, AsyncSession, create_async_engine
+)
+from sqlalchemy.orm import (
+    Session, declarative_base, declared_attr, sessionmaker
+)
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.query_stats import instrument_engine
 
 
 class PreBase:
@@ -16,11 +28,181 @@ class PreBase:
 
 Base = declarative_base(cls=PreBase)
 
-engine = create_async_engine(settings.database_url)
 
-AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession)
+def is_sqlite_file(url: str) -> bool:
+    url = make_url(url)
+    return url.get_backend_name() == 'sqlite' and url.database not in (
+        None, '', ':memory:'
+    )
+
+
+def get_sqlite_pragmas() -> dict:
+    if not settings.sqlite_tuning:
+        return {}
+    return {
+        'journal_mode': settings.sqlite_journal_mode,
+        'synchronous': settings.sqlite_synchronous,
+        'mmap_size': settings.sqlite_mmap_size,
+        'cache_size': settings.sqlite_cache_size,
+        'busy_timeout': settings.sqlite_busy_timeout,
+        'temp_store': settings.sqlite_temp_store,
+    }
+
+
+def get_engine_options(url: str, pragmas: Optional[dict] = None) -> dict:
+    if make_url(url).get_backend_name() == 'sqlite':
+        if not pragmas or not is_sqlite_file(url):
+            return {}
+        # По умолчанию aiosqlite открывает файл заново на каждую сессию
+        # (NullPool): пул сохраняет соединения вместе с их mmap и кэшем
+        # страниц, и прагмы применяются один раз на соединение.
+        return dict(
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=settings.pool_size,
+            max_overflow=settings.pool_max_overflow,
+            pool_timeout=settings.pool_timeout,
+        )
+    return dict(
+        pool_size=settings.pool_size,
+        max_overflow=settings.pool_max_overflow,
+        pool_timeout=settings.pool_timeout,
+        pool_recycle=settings.pool_recycle,
+        pool_pre_ping=settings.pool_pre_ping,
+    )
+
+
+def set_sqlite_pragmas(engine: AsyncEngine, pragmas: dict) -> None:
+    @event.listens_for(engine.sync_engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+
+SQLITE_WRITE_LOCK = 'sqlite_write_lock'
+PENDING_COUNTERS = 'pending_counters'
+# По одной очереди на event loop: у каждого TestClient свой цикл.
+sqlite_write_locks: WeakKeyDictionary = WeakKeyDictionary()
+
+
+async def begin_sqlite_write(session: AsyncSession) -> None:
+    '''
+    Начинает транзакцию записи SQLite через BEGIN IMMEDIATE.
+
+    Запись в SQLite ждёт блокировку в busy handler, который не соблюдает
+    очерёдность: при десятках одновременных записей часть запросов
+    не дожидается её за busy timeout. Поэтому записи одного процесса
+    сначала становятся в очередь asyncio.Lock (FIFO), и до SQLite
+    доходит не больше одной. Блокировка снимается по окончании
+    транзакции сессии. Если транзакция уже начата изменением,
+    блокировка записи у неё уже есть.
+    '''
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    if raw_connection.driver_connection.in_transaction:
+        return
+    loop = asyncio.get_running_loop()
+    lock = sqlite_write_locks.setdefault(loop, asyncio.Lock())
+    await lock.acquire()
+    session.sync_session.info[SQLITE_WRITE_LOCK] = lock
+    await session.execute(text('BEGIN IMMEDIATE'))
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def release_sqlite_write(session: Session, transaction) -> None:
+    if transaction.parent is not None:
+        return
+    lock = session.info.pop(SQLITE_WRITE_LOCK, None)
+    if lock is not None:
+        lock.release()
+    # Счётчики не зафиксированной транзакции отбрасываются.
+    session.info.pop(PENDING_COUNTERS, None)
+
+
+def record_after_commit(session: AsyncSession, counters: dict) -> None:
+    '''
+    Откладывает счётчики метрик до commit транзакции сессии: запросы,
+    завершившиеся ошибкой, и повторы пакета DonationWriter после
+    отката не учитываются.
+    '''
+    pending = session.sync_session.info.setdefault(PENDING_COUNTERS, {})
+    for name, value in counters.items():
+        pending[name] = pending.get(name, 0) + value
+
+
+@event.listens_for(Session, 'after_commit')
+def apply_pending_counters(session: Session) -> None:
+    counters = session.info.pop(PENDING_COUNTERS, None)
+    if counters:
+        metrics.record(counters)
+
+
+def make_engine(url: str, pragmas: Optional[dict] = None) -> AsyncEngine:
+    if pragmas is None and is_sqlite_file(url):
+        pragmas = get_sqlite_pragmas()
+    engine = create_async_engine(url, **get_engine_options(url, pragmas))
+    if pragmas and is_sqlite_file(url):
+        set_sqlite_pragmas(engine, pragmas)
+    if settings.sql_instrumentation:
+        instrument_engine(engine)
+    return engine
+
+
+def make_read_engine(primary: AsyncEngine) -> AsyncEngine:
+    '''
+    Движок для тяжёлых чтений: реплика из read_replica_url или отдельный
+    пул read-only соединений к тому же файлу SQLite в режиме WAL.
+    Если ни то, ни другое не настроено, чтения идут через основной движок.
+    '''
+    if settings.read_replica_url:
+        return make_engine(settings.read_replica_url)
+    if settings.sqlite_read_only and is_sqlite_file(settings.database_url):
+        return make_engine(settings.database_url, {
+            'journal_mode': 'WAL',
+            **get_sqlite_pragmas(),
+            'query_only': 'ON',
+        })
+    return primary
+
+
+def get_pool_stats() -> dict:
+    stats = {}
+    for name, pool_engine in (('primary', engine), ('read', read_engine)):
+        pool = pool_engine.pool
+        stats[name] = {'pool': type(pool).__name__}
+        for attr in ('size', 'checkedin', 'checkedout', 'overflow'):
+            if hasattr(pool, attr):
+                stats[name][attr] = getattr(pool, attr)()
+    return stats
+
+
+engine = make_engine(settings.database_url)
+read_engine = make_read_engine(engine)
+
+# Объекты не сбрасываются после commit: значения id и умолчаний уже
+# получены при flush, и ответ строится без повторного SELECT.
+AsyncSessionLocal = sessionmaker(
+    engine, class_=AsyncSession, expire_on_commit=False
+)
+AsyncReadSessionLocal = sessionmaker(
+    read_engine, class_=AsyncSession, expire_on_commit=False
+)
 
 
 async def get_async_session():
     async with AsyncSessionLocal() as async_session:
         yield async_session
+
+
+async def get_separate_read_session():
+    async with AsyncReadSessionLocal() as async_session:
+        yield async_session
+
+
+# Без отдельного движка для чтений зависимость совпадает с основной,
+# так что переопределение get_async_session действует и на чтения.
+get_read_session = (
+    get_async_session if read_engine is engine
+    else get_separate_read_session
+)
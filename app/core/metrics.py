@@ -0,0 +1,180 @@
+import time
+from bisect import bisect_left
+from typing import Callable, Optional
+
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+UNMATCHED_ROUTE = '<unmatched>'
+
+
+class Histogram:
+    '''Гистограмма с фиксированными логарифмическими корзинами.'''
+
+    __slots__ = ('counts', 'sum')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.sum += value
+
+
+class Metrics:
+    '''
+    Метрики одного процесса (воркера uvicorn).
+
+    Все обновления выполняются в потоке event loop без await между
+    чтением и записью, поэтому обходятся без блокировок; каждый воркер
+    агрегирует свои значения, а Prometheus опрашивает их по отдельности.
+    '''
+
+    def __init__(self):
+        self.latency: dict[tuple[str, str], Histogram] = {}
+        self.statuses: dict[tuple[str, str, int], int] = {}
+        self.in_flight = 0
+        self.counters = {
+            'donations_allocated': 0,
+            'projects_closed': 0,
+            'donations_closed': 0,
+            'invested_amount': 0,
+        }
+        self.gauges: dict[str, Callable[[], dict]] = {}
+
+    def observe_request(
+        self, method: str, route: str, status: int, elapsed: float
+    ) -> None:
+        histogram = self.latency.get((method, route))
+        if histogram is None:
+            histogram = self.latency[(method, route)] = Histogram()
+        histogram.observe(elapsed)
+        key = (method, route, status)
+        self.statuses[key] = self.statuses.get(key, 0) + 1
+
+    def record(self, counters: dict[str, int]) -> None:
+        for name, value in counters.items():
+            self.counters[name] += value
+
+    def reset(self) -> None:
+        self.latency.clear()
+        self.statuses.clear()
+        for name in self.counters:
+            self.counters[name] = 0
+
+    def render(self) -> str:
+        lines = [
+            '# TYPE qrkot_http_request_duration_seconds histogram',
+        ]
+        for (method, route), histogram in self.latency.items():
+            labels = f'method="{method}",route="{route}"'
+            cumulative = 0
+            for bound, count in zip(
+                LATENCY_BUCKETS + ('+Inf',), histogram.counts
+            ):
+                cumulative += count
+                lines.append(
+                    'qrkot_http_request_duration_seconds_bucket'
+                    f'{{{labels},le="{bound}"}} {cumulative}'
+                )
+            lines.append(
+                f'qrkot_http_request_duration_seconds_sum{{{labels}}} '
+                f'{histogram.sum}'
+            )
+            lines.append(
+                f'qrkot_http_request_duration_seconds_count{{{labels}}} '
+                f'{cumulative}'
+            )
+        lines.append('# TYPE qrkot_http_requests_total counter')
+        for (method, route, status), count in self.statuses.items():
+            lines.append(
+                'qrkot_http_requests_total'
+                f'{{method="{method}",route="{route}",status="{status}"}} '
+                f'{count}'
+            )
+        lines.append('# TYPE qrkot_http_requests_in_flight gauge')
+        lines.append(f'qrkot_http_requests_in_flight {self.in_flight}')
+        for name, value in self.counters.items():
+            lines.append(f'# TYPE qrkot_{name}_total counter')
+            lines.append(f'qrkot_{name}_total {value}')
+        for name, collect in self.gauges.items():
+            lines.append(f'# TYPE qrkot_{name} gauge')
+            for labels, value in collect().items():
+                lines.append(f'qrkot_{name}{{{labels}}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+def count_allocation(
+    model_name: str,
+    invested_amounts: list[int],
+    entries: list,
+    closed_targets: int,
+) -> dict[str, int]:
+    '''
+    Счётчики одного распределения: invested_amounts — суммы, вложенные
+    в целевые объекты, entries — затронутые открытые объекты модели
+    model_name, closed_targets — число закрытых целевых объектов.
+    '''
+    closed = sum(1 for entry in entries if not entry.remains)
+    if model_name == 'donation':
+        return {
+            'invested_amount': sum(invested_amounts),
+            'donations_allocated': len(entries),
+            'donations_closed': closed,
+            'projects_closed': closed_targets,
+        }
+    return {
+        'invested_amount': sum(invested_amounts),
+        'donations_allocated': sum(
+            1 for amount in invested_amounts if amount
+        ),
+        'donations_closed': closed_targets,
+        'projects_closed': closed,
+    }
+
+
+class MetricsMiddleware:
+    '''
+    ASGI-middleware: время ответа, статусы и число запросов в обработке
+    по шаблону маршрута (`/charity_project/{project_id}`, а не по пути).
+    '''
+
+    def __init__(self, app):
+        self.app = app
+        self.routes: Optional[dict] = None
+
+    def get_route(self, scope) -> str:
+        if self.routes is None:
+            self.routes = {
+                route.endpoint: route.path
+                for route in scope['app'].routes
+                if hasattr(route, 'endpoint')
+            }
+        return self.routes.get(scope.get('endpoint'), UNMATCHED_ROUTE)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        metrics.in_flight += 1
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            metrics.in_flight -= 1
+            metrics.observe_request(
+                scope['method'], self.get_route(scope), status,
+                time.perf_counter() - started,
+            )
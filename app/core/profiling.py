@@ -0,0 +1,125 @@
+import cProfile
+import io
+import pstats
+import re
+import time
+import types
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from starlette.datastructures import Headers, QueryParams
+from starlette.requests import Request
+
+from app.core.config import settings
+
+PROFILE_HEADER = 'x-profile'
+PROFILE_QUERY = 'profile'
+
+
+def profile_requested(headers: Headers, query_params: QueryParams) -> bool:
+    return any(
+        value not in ('', '0') for value in (
+            headers.get(PROFILE_HEADER, ''),
+            query_params.get(PROFILE_QUERY, ''),
+        )
+    )
+
+
+@types.coroutine
+def run_profiled(coro, profiler: cProfile.Profile):
+    '''
+    Выполняет корутину, включая профилировщик только на время её
+    собственных шагов: пока запрос ожидает I/O, в event loop выполняются
+    другие запросы, и они в отчёт не попадают.
+    '''
+    value, error = None, None
+    while True:
+        profiler.enable()
+        try:
+            if error is None:
+                future = coro.send(value)
+            else:
+                future = coro.throw(error)
+        except StopIteration as stop:
+            return stop.value
+        finally:
+            profiler.disable()
+        try:
+            value, error = (yield future), None
+        except GeneratorExit:
+            coro.close()
+            raise
+        except BaseException as exception:
+            value, error = None, exception
+
+
+def format_report(profiler: cProfile.Profile) -> str:
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats(
+        'cumulative'
+    ).print_stats(settings.profile_limit)
+    return stream.getvalue()
+
+
+def save_report(profiler: cProfile.Profile, scope) -> Path:
+    directory = Path(settings.profile_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    slug = re.sub(r'[^\w]+', '_', scope['path']).strip('_') or 'root'
+    path = directory / (
+        f'{time.strftime("%Y%m%d-%H%M%S")}-{scope["method"].lower()}-'
+        f'{slug}-{time.perf_counter_ns() % 1000000}.prof'
+    )
+    profiler.dump_stats(path)
+    return path
+
+
+async def send_report(send, report: str, status: int) -> None:
+    body = report.encode()
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/plain; charset=utf-8'),
+            (b'content-length', str(len(body)).encode('latin-1')),
+            (b'x-profile-status', str(status).encode('latin-1')),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+class ProfilingMiddleware:
+    '''
+    Профилирует отдельный запрос с заголовком X-Profile или параметром
+    ?profile=1. До запуска профилировщика authorize проверяет, что запрос
+    сделан суперпользователем; остальные запросы с флагом выполняются
+    как обычно. Без каталога profile_dir ответ заменяется текстовым
+    отчётом cProfile, с ним отчёт сохраняется в .prof, а путь
+    возвращается в X-Profile-File.
+    '''
+
+    def __init__(self, app, authorize: Callable[[Request], Awaitable[bool]]):
+        self.app = app
+        self.authorize = authorize
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not profile_requested(
+            Headers(scope=scope), QueryParams(scope['query_string'])
+        ) or not await self.authorize(Request(scope)):
+            return await self.app(scope, receive, send)
+        messages = []
+
+        async def buffer(message):
+            messages.append(message)
+
+        profiler = cProfile.Profile()
+        await run_profiled(self.app(scope, receive, buffer), profiler)
+        start = messages[0]
+        if settings.profile_dir:
+            path = save_report(profiler, scope)
+            start['headers'] = list(start.get('headers', [])) + [
+                (b'x-profile-file', str(path).encode('latin-1')),
+            ]
+            for message in messages:
+                await send(message)
+            return
+        await send_report(send, format_report(profiler), start['status'])
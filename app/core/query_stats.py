@@ -0,0 +1,135 @@
+import logging
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import settings
+from app.core.tracing import current_trace
+
+logger = logging.getLogger(__name__)
+
+EXPLAIN_PREFIXES = {
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+    'postgresql': 'EXPLAIN ',
+}
+
+
+class QueryStats:
+    '''Счётчики SQL-запросов, выполненных в рамках одного HTTP-запроса.'''
+
+    __slots__ = ('count', 'duration')
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def add(self, elapsed: float) -> None:
+        self.count += 1
+        self.duration += elapsed
+
+
+query_stats: ContextVar[Optional[QueryStats]] = ContextVar(
+    'query_stats', default=None
+)
+
+
+def explain(connection, statement: str, parameters) -> str:
+    '''
+    Возвращает план запроса, выполняя EXPLAIN напрямую через DBAPI,
+    чтобы не вызывать события движка повторно.
+    '''
+    prefix = EXPLAIN_PREFIXES.get(connection.dialect.name)
+    if prefix is None:
+        return ''
+    explain_cursor = connection.connection.cursor()
+    try:
+        explain_cursor.execute(prefix + statement, parameters)
+        return '\n'.join(
+            ' '.join(str(column) for column in row)
+            for row in explain_cursor.fetchall()
+        )
+    except Exception as error:
+        return f'EXPLAIN недоступен: {error}'
+    finally:
+        explain_cursor.close()
+
+
+def before_cursor_execute(
+    connection, cursor, statement, parameters, context, executemany
+):
+    # Время старта хранится в контексте выполнения: при ошибке
+    # запроса он отбрасывается вместе с ним и ничего не копит
+    # на соединении из пула.
+    context.query_started = time.perf_counter()
+
+
+def after_cursor_execute(
+    connection, cursor, statement, parameters, context, executemany
+):
+    finished = time.perf_counter()
+    started = context.query_started
+    elapsed = finished - started
+    stats = query_stats.get()
+    if stats is not None:
+        stats.add(elapsed)
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add(statement.split(None, 1)[0], 'sql', started, finished)
+    if elapsed * 1000 < settings.slow_query_ms:
+        return
+    plan = '' if executemany else explain(connection, statement, parameters)
+    logger.warning(
+        'Медленный запрос (%.1f ms): %s\n%s', elapsed * 1000, statement, plan
+    )
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    event.listen(
+        engine.sync_engine, 'before_cursor_execute', before_cursor_execute
+    )
+    event.listen(
+        engine.sync_engine, 'after_cursor_execute', after_cursor_execute
+    )
+
+
+def format_server_timing(stats: QueryStats, total: float) -> bytes:
+    return (
+        f'db;dur={stats.duration * 1000:.2f};desc="{stats.count} queries", '
+        f'app;dur={total * 1000:.2f}'
+    ).encode('latin-1')
+
+
+class QueryStatsMiddleware:
+    '''
+    ASGI-middleware: заводит счётчики запросов к БД на каждый HTTP-запрос
+    и добавляет их в заголовок Server-Timing.
+    '''
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        stats = QueryStats()
+        token = query_stats.set(stats)
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message['type'] == 'http.response.start':
+                message.setdefault('headers', [])
+                message['headers'] = list(message['headers']) + [(
+                    b'server-timing',
+                    format_server_timing(
+                        stats, time.perf_counter() - started
+                    ),
+                )]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            query_stats.reset(token)
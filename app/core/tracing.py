@@ -0,0 +1,282 @@
+import random
+import sys
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from itertools import count
+from typing import Callable, Optional
+
+from fastapi.dependencies.models import Dependant
+from fastapi.dependencies.utils import (
+    is_async_gen_callable, is_coroutine_callable
+)
+from fastapi.routing import APIRoute, request_response
+
+from app.core.config import settings
+
+DEPENDENCY_CATEGORIES = (
+    ('app.core.db', 'db'),
+    ('app.core.user', 'auth'),
+    ('fastapi_users', 'auth'),
+)
+DEPENDENCY_SPAN_CATEGORIES = ('auth', 'db', 'dependency')
+
+
+class Trace:
+    '''Спаны одного HTTP-запроса, время — по perf_counter.'''
+
+    __slots__ = (
+        'id', 'method', 'path', 'route', 'status', 'timestamp',
+        'started', 'finished', 'spans',
+    )
+
+    def __init__(self, id: int, method: str, path: str, route: str):
+        self.id = id
+        self.method = method
+        self.path = path
+        self.route = route
+        self.status = None
+        self.timestamp = time.time()
+        self.started = time.perf_counter()
+        self.finished = None
+        self.spans: list[tuple[str, str, float, float]] = []
+
+    def add(self, name: str, category: str, started: float, finished: float):
+        self.spans.append((name, category, started, finished))
+
+    def finish(self) -> None:
+        '''
+        Закрывает трассу и добавляет фазы, которые FastAPI выполняет
+        вне зависимостей и обработчика: разбор тела запроса, валидацию
+        параметров и сериализацию ответа.
+        '''
+        self.finished = time.perf_counter()
+        handler = next(
+            (span for span in self.spans if span[1] == 'handler'), None
+        )
+        if handler is None:
+            return
+        dependencies = [
+            span for span in self.spans
+            if span[1] in DEPENDENCY_SPAN_CATEGORIES
+        ]
+        first = min(
+            (span[2] for span in dependencies), default=handler[2]
+        )
+        last = max((span[3] for span in dependencies), default=first)
+        self.add('parse', 'validation', self.started, first)
+        self.add('validation', 'validation', last, handler[2])
+        self.add('serialization', 'serialization', handler[3], self.finished)
+
+    def as_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'method': self.method,
+            'path': self.path,
+            'route': self.route,
+            'status': self.status,
+            'timestamp': self.timestamp,
+            'duration_ms': (self.finished - self.started) * 1000,
+            'spans': [
+                {
+                    'name': name,
+                    'category': category,
+                    'start_ms': (started - self.started) * 1000,
+                    'duration_ms': (finished - started) * 1000,
+                }
+                for name, category, started, finished in sorted(
+                    self.spans, key=lambda span: span[2]
+                )
+            ],
+        }
+
+    def chrome_events(self) -> list[dict]:
+        base = self.timestamp * 1e6
+        return [{
+            'name': f'{self.method} {self.route}',
+            'cat': 'request',
+            'ph': 'X',
+            'ts': base,
+            'dur': (self.finished - self.started) * 1e6,
+            'pid': 1,
+            'tid': self.id,
+            'args': {'path': self.path, 'status': self.status},
+        }] + [
+            {
+                'name': name,
+                'cat': category,
+                'ph': 'X',
+                'ts': base + (started - self.started) * 1e6,
+                'dur': (finished - started) * 1e6,
+                'pid': 1,
+                'tid': self.id,
+            }
+            for name, category, started, finished in self.spans
+        ]
+
+
+current_trace: ContextVar[Optional[Trace]] = ContextVar(
+    'current_trace', default=None
+)
+traces: deque = deque(maxlen=settings.trace_buffer_size)
+trace_ids = count(1)
+
+
+@contextmanager
+def trace_span(name: str, category: str):
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, category, started, time.perf_counter())
+
+
+def get_category(call: Callable) -> str:
+    module = getattr(call, '__module__', None) or type(call).__module__
+    for prefix, category in DEPENDENCY_CATEGORIES:
+        if module.startswith(prefix):
+            return category
+    return 'dependency'
+
+
+def get_name(call: Callable) -> str:
+    return getattr(call, '__name__', None) or type(call).__name__
+
+
+def traced(
+    call: Callable, name: str, category: str
+) -> Callable:
+    '''
+    Оборачивает асинхронную зависимость или обработчик, сохраняя сигнатуру.
+    Для yield-зависимостей измеряется код до yield; синхронные вызовы
+    FastAPI выполняет в пуле потоков, и они остаются без обёртки.
+    '''
+    if is_async_gen_callable(call):
+        context_manager = asynccontextmanager(call)
+
+        @wraps(call)
+        async def generator_wrapper(*args, **kwargs):
+            context = context_manager(*args, **kwargs)
+            with trace_span(name, category):
+                value = await context.__aenter__()
+            try:
+                yield value
+            except BaseException:
+                if not await context.__aexit__(*sys.exc_info()):
+                    raise
+            else:
+                await context.__aexit__(None, None, None)
+
+        return generator_wrapper
+    if is_coroutine_callable(call):
+        @wraps(call)
+        async def wrapper(*args, **kwargs):
+            trace = current_trace.get()
+            if trace is None:
+                return await call(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return await call(*args, **kwargs)
+            finally:
+                trace.add(name, category, started, time.perf_counter())
+
+        return wrapper
+    return call
+
+
+class TracedOverrides:
+    '''
+    Провайдер переопределений для маршрутов с обёрнутыми зависимостями:
+    ключами app.dependency_overrides остаются исходные функции, поэтому
+    переопределения переносятся на их обёртки (и тоже трассируются).
+    '''
+
+    def __init__(self, provider, originals: dict):
+        self.provider = provider
+        self.originals = originals
+        self.wrapped_overrides = {}
+
+    @property
+    def dependency_overrides(self) -> dict:
+        overrides = self.provider.dependency_overrides
+        if not overrides:
+            return overrides
+        mapped = dict(overrides)
+        for wrapper, original in self.originals.items():
+            override = overrides.get(original)
+            if override is None:
+                # При переопределениях FastAPI заново строит дерево
+                # зависимостей из исходных функций: подменяем их обёртками.
+                mapped[original] = wrapper
+                continue
+            if override not in self.wrapped_overrides:
+                self.wrapped_overrides[override] = traced(
+                    override, get_name(original), get_category(original)
+                )
+            mapped[wrapper] = mapped[original] = (
+                self.wrapped_overrides[override]
+            )
+        return mapped
+
+
+def wrap_dependencies(dependant: Dependant, originals: dict) -> None:
+    wrappers = {original: wrapper for wrapper, original in originals.items()}
+    for sub_dependant in dependant.dependencies:
+        call = sub_dependant.call
+        if call in originals:
+            continue
+        if call not in wrappers:
+            wrapper = traced(call, get_name(call), get_category(call))
+            if wrapper is call:
+                wrap_dependencies(sub_dependant, originals)
+                continue
+            originals[wrapper] = call
+            wrappers[call] = wrapper
+        sub_dependant.call = wrappers[call]
+        wrap_dependencies(sub_dependant, originals)
+
+
+def trace_handler(handler: Callable, route: APIRoute) -> Callable:
+    async def traced_handler(request):
+        if random.random() >= settings.trace_sample_rate:
+            return await handler(request)
+        trace = Trace(
+            next(trace_ids), request.method, request.url.path, route.path
+        )
+        token = current_trace.set(trace)
+        try:
+            response = await handler(request)
+            trace.status = response.status_code
+            return response
+        finally:
+            current_trace.reset(token)
+            trace.finish()
+            traces.append(trace)
+
+    return traced_handler
+
+
+def trace_routes(app) -> None:
+    '''
+    Включает трассировку для всех маршрутов приложения: спаны
+    зависимостей, обработчика и фаз запроса попадают в кольцевой буфер.
+    '''
+    originals = {}
+    provider = TracedOverrides(app, originals)
+    for route in app.routes:
+        if not isinstance(route, APIRoute):
+            continue
+        wrap_dependencies(route.dependant, originals)
+        route.dependant.call = traced(
+            route.dependant.call, route.name, 'handler'
+        )
+        route.dependency_overrides_provider = provider
+        route.app = request_response(
+            trace_handler(route.get_route_handler(), route)
+        )
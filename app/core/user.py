@@ -1,17 +1,26 @@
-from typing import Optional, Union
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Optional, Union
 
+import jwt
 from fastapi import Depends, Request
+from fastapi.security import OAuth2PasswordRequestForm
 from fastapi_users import (
-    BaseUserManager, FastAPIUsers, IntegerIDMixin, InvalidPasswordException
+    BaseUserManager, FastAPIUsers, IntegerIDMixin, InvalidPasswordException,
+    exceptions
 )
 from fastapi_users.authentication import (
     AuthenticationBackend, BearerTransport, JWTStrategy
 )
+from fastapi_users.jwt import decode_jwt
 from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 
 from app.constants import SESSION_LIFETIME
+from app.core.cache import TTLCache
 from app.core.config import settings
+from app.core.password import PasswordPool
 from app.core.db import get_async_session
 from app.models.user import User
 from app.schemas.user import UserCreate
@@ -23,9 +32,74 @@ async def get_user_db(session: AsyncSession = Depends(get_async_session)):
 
 bearer_transport = BearerTransport(tokenUrl='auth/jwt/login')
 
+password_pool = PasswordPool(
+    settings.password_workers,
+    settings.password_max_pending,
+    settings.password_use_processes,
+)
+token_cache = TTLCache(settings.user_cache_size, settings.user_cache_ttl)
+user_cache = TTLCache(settings.user_cache_size, settings.user_cache_ttl)
+
+
+def dump_user(user: User) -> dict[str, Any]:
+    return {
+        column.name: getattr(user, column.name)
+        for column in User.__table__.columns
+    }
+
+
+def load_user(user_data: dict[str, Any]) -> User:
+    user = User(**user_data)
+    make_transient_to_detached(user)
+    return user
+
+
+def invalidate_user(user_id: Any) -> None:
+    user_cache.pop(user_id)
+
+
+class CachedJWTStrategy(JWTStrategy):
+    '''
+    JWT-стратегия, которая кэширует расшифрованные токены и пользователей.
+
+    Повторный запрос с тем же токеном не декодирует JWT и не обращается
+    к БД, пока запись не устарела или не сброшена хуками UserManager.
+    Каждый запрос получает собственный detached-объект пользователя,
+    который можно изменить и сохранить в сессии запроса.
+    '''
+
+    async def read_token(
+        self, token: Optional[str], user_manager: BaseUserManager
+    ) -> Optional[User]:
+        if token is None:
+            return None
+        user_id = token_cache.get(token)
+        if user_id is None:
+            try:
+                data = decode_jwt(
+                    token, self.decode_key, self.token_audience,
+                    algorithms=[self.algorithm]
+                )
+                user_id = user_manager.parse_id(data['user_id'])
+            except (jwt.PyJWTError, KeyError, exceptions.InvalidID):
+                return None
+            token_cache.set(
+                token, user_id,
+                ttl=data['exp'] - time.time() if 'exp' in data else None
+            )
+        user_data = user_cache.get(user_id)
+        if user_data is None:
+            try:
+                user = await user_manager.get(user_id)
+            except exceptions.UserNotExists:
+                return None
+            user_cache.set(user_id, dump_user(user))
+            return user
+        return load_user(user_data)
+
 
 def get_jwt_strategy() -> JWTStrategy:
-    return JWTStrategy(
+    return CachedJWTStrategy(
         secret=settings.secret,
         lifetime_seconds=SESSION_LIFETIME
     )
@@ -39,6 +113,64 @@ auth_backend = AuthenticationBackend(
 
 
 class UserManager(IntegerIDMixin, BaseUserManager[User, int]):
+    '''
+    Менеджер пользователей, который хеширует и проверяет пароли
+    в password_pool, не занимая event loop.
+    '''
+
+    async def authenticate(
+        self, credentials: OAuth2PasswordRequestForm
+    ) -> Optional[User]:
+        try:
+            user = await self.get_by_email(credentials.username)
+        except exceptions.UserNotExists:
+            # Хешируем пароль, чтобы время ответа не выдавало
+            # отсутствие пользователя.
+            await password_pool.hash(credentials.password)
+            return None
+        verified, updated_password_hash = (
+            await password_pool.verify_and_update(
+                credentials.password, user.hashed_password
+            )
+        )
+        if not verified:
+            return None
+        if updated_password_hash is not None:
+            await self.user_db.update(
+                user, {'hashed_password': updated_password_hash}
+            )
+        return user
+
+    async def create(
+        self,
+        user_create: UserCreate,
+        safe: bool = False,
+        request: Optional[Request] = None,
+    ) -> User:
+        await self.validate_password(user_create.password, user_create)
+        if await self.user_db.get_by_email(user_create.email) is not None:
+            raise exceptions.UserAlreadyExists()
+        user_dict = (
+            user_create.create_update_dict()
+            if safe
+            else user_create.create_update_dict_superuser()
+        )
+        user_dict['hashed_password'] = await password_pool.hash(
+            user_dict.pop('password')
+        )
+        created_user = await self.user_db.create(user_dict)
+        await self.on_after_register(created_user, request)
+        return created_user
+
+    async def _update(self, user: User, update_dict: dict[str, Any]) -> User:
+        if 'password' in update_dict:
+            update_dict = dict(update_dict)
+            password = update_dict.pop('password')
+            await self.validate_password(password, user)
+            update_dict['hashed_password'] = await password_pool.hash(
+                password
+            )
+        return await super()._update(user, update_dict)
 
     async def validate_password(
         self,
@@ -59,6 +191,28 @@ class UserManager(IntegerIDMixin, BaseUserManager[User, int]):
     ):
         print(f'Пользователь {user.email} зарегистрирован.')
 
+    async def on_after_update(
+        self,
+        user: User,
+        update_dict: dict[str, Any],
+        request: Optional[Request] = None,
+    ):
+        invalidate_user(user.id)
+
+    async def on_after_verify(
+        self, user: User, request: Optional[Request] = None
+    ):
+        invalidate_user(user.id)
+
+    async def on_after_reset_password(
+        self, user: User, request: Optional[Request] = None
+    ):
+        invalidate_user(user.id)
+
+    async def delete(self, user: User) -> None:
+        await super().delete(user)
+        invalidate_user(user.id)
+
 
 async def get_user_manager(user_db=Depends(get_user_db)):
     yield UserManager(user_db)
@@ -72,3 +226,24 @@ fastapi_users = FastAPIUsers[User, int](
 
 current_user = fastapi_users.current_user(active=True)
 current_superuser = fastapi_users.current_user(active=True, superuser=True)
+
+
+async def is_profiling_allowed(request: Request) -> bool:
+    '''
+    Проверяет, что флаг профилирования прислал суперпользователь.
+
+    Вызывается из ProfilingMiddleware только для запросов с флагом,
+    до запуска профилировщика, поэтому сессия открывается здесь же
+    (с учётом dependency_overrides приложения).
+    '''
+    token = await bearer_transport.scheme(request)
+    if token is None:
+        return False
+    get_session = request.app.dependency_overrides.get(
+        get_async_session, get_async_session
+    )
+    async with asynccontextmanager(get_session)() as session:
+        user = await get_jwt_strategy().read_token(
+            token, UserManager(SQLAlchemyUserDatabase(session, User))
+        )
+    return user is not None and user.is_active and user.is_superuser
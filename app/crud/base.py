@@ -1,11 +1,17 @@
+from datetime import datetime
+from typing import Iterable, Optional
 
-from typing import Optional
-
-from fastapi.encoders import jsonable_encoder
-from sqlalchemy import select
+from sqlalchemy import case, delete, insert, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models import User
+from app.constants import OPEN_SCAN_FIRST_CHUNK
+from app.core.config import settings
+from app.core.db import begin_sqlite_write, record_after_commit
+from app.core.metrics import count_allocation
+from app.core.tracing import trace_span
+from app.crud.funding_book import OpenEntry, funding_book
+from app.crud.invest import invest_amounts, set_invested_amount
+from app.models import CharityProject, Investment, User
 
 
 class CRUDBase:
@@ -25,23 +31,263 @@ class CRUDBase:
         )
         return db_obj.scalars().first()
 
-    async def get_multi(
+    def get_filters(
+        self,
+        fully_invested: Optional[bool] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        **attrs,
+    ) -> list:
+        filters = [
+            getattr(self.model, attr_name) == attr_value
+            for attr_name, attr_value in attrs.items()
+            if attr_value is not None
+        ]
+        if fully_invested is not None:
+            is_open = self.model.is_open()
+            filters.append(~is_open if fully_invested else is_open)
+        if created_from is not None:
+            filters.append(self.model.create_date >= created_from)
+        if created_to is not None:
+            filters.append(self.model.create_date < created_to)
+        return filters
+
+    def get_multi_query(
         self,
-        session: AsyncSession
+        query,
+        limit: Optional[int] = None,
+        after: Optional[int] = None,
+        **filters,
     ):
-        db_objs = await session.execute(select(self.model))
-        return db_objs.scalars().all()
+        query = query.where(
+            *self.get_filters(**filters)
+        ).order_by(self.model.id)
+        if after is not None:
+            query = query.where(self.model.id > after)
+        if limit is not None:
+            query = query.limit(limit)
+        return query
+
+    def select_fields(self, fields: list[str]):
+        return select(*(getattr(self.model, field) for field in fields))
 
-    async def get_objects_to_invest(
+    async def get_multi_rows(
         self,
-        session: AsyncSession
+        fields: list[str],
+        session: AsyncSession,
+        limit: Optional[int] = None,
+        after: Optional[int] = None,
+        **filters,
     ):
-        db_objs = await session.execute(
-            select(self.model).where(self.model.fully_invested == 0).order_by(
-                self.model.id
+        db_rows = await session.execute(
+            self.get_multi_query(
+                self.select_fields(fields), limit, after, **filters
             )
         )
-        return db_objs.scalars().all()
+        return db_rows.all()
+
+    async def stream_multi(
+        self,
+        fields: list[str],
+        session: AsyncSession,
+        **filters,
+    ):
+        return await session.stream(
+            self.get_multi_query(self.select_fields(fields), **filters)
+        )
+
+    def get_open_chunk_query(
+        self,
+        after: Optional[int] = None,
+        limit: Optional[int] = None,
+    ):
+        model = self.model
+        query = select(
+            model.id, model.full_amount, model.invested_amount
+        ).where(model.is_open())
+        if after is not None:
+            query = query.where(model.id > after)
+        return query.order_by(model.id).limit(limit)
+
+    async def scan_open_prefix(
+        self,
+        amount: int,
+        session: AsyncSession,
+        lock: bool = False,
+    ) -> list[OpenEntry]:
+        '''
+        Читает открытые строки из головы очереди, пока их остатка
+        не хватит на сумму amount.
+
+        Строки выбираются по индексу открытой очереди порциями, которые
+        удваиваются после последнего прочитанного id, поэтому число
+        прочитанных строк не больше max(OPEN_SCAN_FIRST_CHUNK, удвоенное
+        число нужных) и не зависит от длины очереди. С lock строки
+        блокируются (SELECT ... FOR UPDATE) начиная с порции в одну строку,
+        чтобы не держать лишних блокировок; с allocation_skip_locked
+        строки, занятые другими транзакциями, пропускаются: воркеры
+        распределяют параллельно ценой возможного отступления от строгого
+        FIFO.
+        '''
+        entries = []
+        covered = 0
+        chunk_size = 1 if lock else OPEN_SCAN_FIRST_CHUNK
+        last_id = None
+        while covered < amount:
+            query = self.get_open_chunk_query(last_id, chunk_size)
+            if lock:
+                query = query.with_for_update(
+                    skip_locked=settings.allocation_skip_locked
+                )
+            rows = (await session.execute(query)).all()
+            for row in rows:
+                if covered >= amount:
+                    break
+                entries.append(OpenEntry(*row))
+                covered += entries[-1].remains
+            if len(rows) < chunk_size:
+                break
+            last_id = rows[-1].id
+            chunk_size *= 2
+        return entries
+
+    async def get_open_prefix(
+        self,
+        amount: int,
+        session: AsyncSession,
+    ) -> list[OpenEntry]:
+        model = self.model
+        if session.bind.dialect.name == 'postgresql':
+            return await self.scan_open_prefix(amount, session, lock=True)
+        if session.bind.dialect.name == 'sqlite':
+            # Без блокировки чтение очереди и UPDATE распределения шли
+            # в разных транзакциях, и параллельные запросы теряли
+            # обновления друг друга.
+            await begin_sqlite_write(session)
+        if funding_book.loaded:
+            ids = funding_book.queue_for(model).pick(amount)
+            if ids:
+                rows = await session.execute(
+                    select(
+                        model.id, model.full_amount, model.invested_amount
+                    ).where(
+                        model.id.in_(ids), model.is_open()
+                    ).order_by(model.id)
+                )
+                entries = [OpenEntry(*row) for row in rows]
+                if sum(entry.remains for entry in entries) >= amount:
+                    return entries
+            # Книга знает только объекты, изменённые этим процессом:
+            # строки других воркеров, app.reconcile и ручных правок
+            # находит запрос к БД.
+        return await self.scan_open_prefix(amount, session)
+
+    async def apply_investment(
+        self,
+        entries: list[OpenEntry],
+        session: AsyncSession,
+    ) -> None:
+        if not entries:
+            return
+        closed_ids = [entry.id for entry in entries if not entry.remains]
+        await session.execute(
+            update(self.model).where(
+                self.model.id.in_([entry.id for entry in entries])
+            ).values(
+                invested_amount=case(
+                    {entry.id: entry.invested_amount for entry in entries},
+                    value=self.model.id,
+                    else_=self.model.invested_amount,
+                ),
+                fully_invested=self.model.id.in_(closed_ids),
+                close_date=case(
+                    (self.model.id.in_(closed_ids), datetime.now()),
+                    else_=self.model.close_date,
+                ),
+            ).execution_options(synchronize_session=False)
+        )
+
+    async def allocate(
+        self,
+        amount: int,
+        session: AsyncSession,
+    ) -> tuple[int, list[OpenEntry]]:
+        invested_amounts, entries = await self.allocate_many(
+            [amount], session
+        )
+        return invested_amounts[0], entries
+
+    async def allocate_many(
+        self,
+        amounts: list[int],
+        session: AsyncSession,
+        transfers: Optional[list[tuple[int, int, int]]] = None,
+    ) -> tuple[list[int], list[OpenEntry]]:
+        with trace_span('allocation', 'allocation'):
+            entries = await self.get_open_prefix(sum(amounts), session)
+            invested_amounts = invest_amounts(amounts, entries, transfers)
+            await self.apply_investment(entries, session)
+        return invested_amounts, entries
+
+    async def add_investments(
+        self,
+        targets: list,
+        transfers: list[tuple[int, int, int]],
+        session: AsyncSession,
+    ) -> None:
+        '''
+        Записывает переводы из invest_amounts в журнал investment одним
+        INSERT; у целевых объектов targets к этому моменту уже есть id.
+        '''
+        if not transfers:
+            return
+        if self.model is CharityProject:
+            target_field, source_field = 'donation_id', 'project_id'
+        else:
+            target_field, source_field = 'project_id', 'donation_id'
+        await session.execute(insert(Investment), [
+            {
+                target_field: targets[index].id,
+                source_field: source_id,
+                'amount': amount,
+            }
+            for index, source_id, amount in transfers
+        ])
+
+    async def invest_into(
+        self,
+        targets: list,
+        session: AsyncSession,
+    ) -> list[OpenEntry]:
+        '''
+        Распределяет открытые объекты модели по остаткам объектов targets
+        (другой модели), сохраняет targets и журнал переводов в текущей
+        транзакции. Возвращает затронутые открытые объекты.
+        '''
+        transfers = []
+        invested_amounts, entries = await self.allocate_many(
+            [
+                target.full_amount - (target.invested_amount or 0)
+                for target in targets
+            ],
+            session,
+            transfers,
+        )
+        closed_targets = 0
+        for target, invested_amount in zip(targets, invested_amounts):
+            set_invested_amount(
+                target, (target.invested_amount or 0) + invested_amount
+            )
+            if target.fully_invested:
+                closed_targets += 1
+        session.add_all(targets)
+        await session.flush()
+        await self.add_investments(targets, transfers, session)
+        record_after_commit(session, count_allocation(
+            self.model.__tablename__, invested_amounts, entries,
+            closed_targets,
+        ))
+        return entries
 
     async def create(
         self,
@@ -57,32 +303,101 @@ class CRUDBase:
         if not need_to_invest:
             session.add(db_obj)
             await session.commit()
-            await session.refresh(db_obj)
         return db_obj
 
+    def returning(self, statement, session: AsyncSession):
+        '''
+        Оборачивает изменяющий запрос так, чтобы он возвращал ORM-объект
+        через RETURNING, если диалект это поддерживает (PostgreSQL),
+        иначе возвращает None.
+        '''
+        if not session.bind.dialect.full_returning:
+            return None
+        return select(self.model).from_statement(
+            statement.returning(*self.model.__table__.columns)
+        ).execution_options(populate_existing=True)
+
+    async def get_fresh(self, obj_id: int, session: AsyncSession):
+        db_obj = await session.execute(
+            select(self.model).where(
+                self.model.id == obj_id
+            ).execution_options(populate_existing=True)
+        )
+        return db_obj.scalars().first()
+
     async def update(
         self,
-        db_obj,
+        obj_id: int,
         obj_in,
         session: AsyncSession,
+        guards: Iterable = (),
+        **values,
     ):
-        obj_data = jsonable_encoder(db_obj)
-        update_data = obj_in.dict(exclude_unset=True)
+        '''
+        Изменяет объект одним UPDATE ... WHERE id = obj_id AND guards,
+        не читая его заранее. values дополняют поля из obj_in
+        (например, SQL-выражениями). Если менять нечего, выполняется
+        SELECT с теми же условиями. Возвращает изменённый объект или
+        None, если строка не подошла под условия; транзакция остаётся
+        открытой.
 
-        for field in obj_data:
-            if field in update_data:
-                setattr(db_obj, field, update_data[field])
-        session.add(db_obj)
-        await session.commit()
-        await session.refresh(db_obj)
-        return db_obj
+        SQLite в SQLAlchemy 1.4 не поддерживает RETURNING, поэтому там
+        объект читается следующим запросом: строка уже заблокирована
+        этим UPDATE до конца транзакции.
+        '''
+        update_data = {
+            field: value
+            for field, value in obj_in.dict(exclude_unset=True).items()
+            if value is not None
+        }
+        update_data.update(values)
+        if not update_data:
+            # Пустой SET — синтаксическая ошибка, поэтому объект
+            # читается тем же условием без изменения.
+            db_obj = await session.execute(
+                select(self.model).where(
+                    self.model.id == obj_id, *guards
+                ).execution_options(populate_existing=True)
+            )
+            return db_obj.scalars().first()
+        statement = update(self.model).where(
+            self.model.id == obj_id, *guards
+        ).values(**update_data).execution_options(synchronize_session=False)
+        returning = self.returning(statement, session)
+        if returning is not None:
+            db_obj = await session.execute(returning)
+            return db_obj.scalars().first()
+        result = await session.execute(statement)
+        if not result.rowcount:
+            return None
+        return await self.get_fresh(obj_id, session)
 
     async def remove(
         self,
-        db_obj,
+        obj_id: int,
         session: AsyncSession,
+        guards: Iterable = (),
     ):
-        await session.delete(db_obj)
+        '''
+        Удаляет объект одним DELETE ... WHERE id = obj_id AND guards
+        и возвращает удалённый объект или None, если строка не подошла
+        под условия. На SQLite объект читается до DELETE, а условия
+        всё равно проверяются самим DELETE.
+        '''
+        statement = delete(self.model).where(
+            self.model.id == obj_id, *guards
+        ).execution_options(synchronize_session=False)
+        returning = self.returning(statement, session)
+        if returning is not None:
+            db_obj = (await session.execute(returning)).scalars().first()
+        else:
+            db_obj = await self.get_fresh(obj_id, session)
+            if db_obj is not None and not (
+                await session.execute(statement)
+            ).rowcount:
+                db_obj = None
+        if db_obj is not None:
+            session.expunge(db_obj)
         await session.commit()
         return db_obj
 
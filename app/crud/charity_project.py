@@ -1,11 +1,12 @@
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import select, update
+from sqlalchemy import case, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.crud.base import CRUDBase
 from app.models import CharityProject
+from app.schemas.charity_project import CharityProjectUpdate
 
 
 class CRUDCharityProject(CRUDBase):
@@ -23,6 +24,57 @@ class CRUDCharityProject(CRUDBase):
         db_project_id = db_project_id.scalars().first()
         return db_project_id
 
+    async def get_existing_names(
+        self,
+        project_names: list[str],
+        session: AsyncSession,
+    ) -> set[str]:
+        db_names = await session.execute(
+            select(CharityProject.name).where(
+                CharityProject.name.in_(project_names)
+            )
+        )
+        return set(db_names.scalars().all())
+
+    async def update_open_project(
+        self,
+        project_id: int,
+        obj_in: CharityProjectUpdate,
+        session: AsyncSession,
+    ) -> Optional[CharityProject]:
+        '''
+        Изменяет открытый проект одним UPDATE. Новая full_amount
+        не может быть меньше вложенной суммы, а равная ей закрывает проект.
+        '''
+        guards = [CharityProject.is_open()]
+        values = {}
+        if obj_in.full_amount is not None:
+            guards.append(
+                CharityProject.invested_amount <= obj_in.full_amount
+            )
+            closes = CharityProject.invested_amount == obj_in.full_amount
+            values = dict(
+                fully_invested=closes,
+                close_date=case(
+                    (closes, datetime.now()),
+                    else_=CharityProject.close_date,
+                ),
+            )
+        return await self.update(
+            project_id, obj_in, session, guards, **values
+        )
+
+    async def remove_unfunded_project(
+        self,
+        project_id: int,
+        session: AsyncSession,
+    ) -> Optional[CharityProject]:
+        '''Удаляет проект одним DELETE, только если в него не вкладывали.'''
+        return await self.remove(project_id, session, [
+            CharityProject.invested_amount == 0,
+            CharityProject.is_open(),
+        ])
+
     async def close_project(
         self,
         project: CharityProject,
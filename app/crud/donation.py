@@ -1,24 +1,28 @@
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.crud.base import CRUDBase
+from app.crud.charity_project import charity_project_crud
+from app.crud.funding_book import OpenEntry
 from app.models import Donation, User
+from app.schemas.donation import DonationBase
 
 
 class CRUDDonation(CRUDBase):
 
-    async def get_donations_by_user(
+    async def create_invested(
         self,
+        donations: list[DonationBase],
+        users: list[User],
         session: AsyncSession,
-        user: User,
-    ) -> list[Donation]:
-        donations = await session.execute(
-            select(Donation).where(
-                Donation.user_id == user.id
-            )
+    ) -> tuple[list[Donation], list[OpenEntry]]:
+        new_donations = [
+            await self.create(donation, session, user, need_to_invest=True)
+            for donation, user in zip(donations, users)
+        ]
+        changed_projects = await charity_project_crud.invest_into(
+            new_donations, session
         )
-        donations = donations.scalars().all()
-        return donations
+        return new_donations, changed_projects
 
 
 donation_crud = CRUDDonation(Donation)
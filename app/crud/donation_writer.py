@@ -0,0 +1,148 @@
+import asyncio
+from typing import Optional
+
+from app.crud.donation import donation_crud
+from app.crud.funding_book import funding_book
+from app.models import CharityProject, User
+from app.schemas.donation import DonationBase, DonationCreate
+
+
+class DonationWriter:
+    '''
+    Групповая запись пожертвований.
+
+    Конкурентные запросы ставятся в очередь, а единственная фоновая задача
+    собирает их в пакеты (по времени ожидания и размеру), распределяет
+    в порядке поступления и фиксирует одним commit.
+    '''
+
+    def __init__(
+        self,
+        session_factory=None,
+        max_delay: float = 0.005,
+        max_size: int = 200,
+    ):
+        self.session_factory = session_factory
+        self.max_delay = max_delay
+        self.max_size = max_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.donations = 0
+        self.last_batch_size = 0
+        self.max_batch_size = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if not self.running:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def submit(
+        self, donation: DonationBase, user: User
+    ) -> DonationCreate:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((donation, user, future))
+        return await future
+
+    def stats(self) -> dict:
+        return {
+            'running': self.running,
+            'queue_depth': self._queue.qsize() if self._queue else 0,
+            'batches': self.batches,
+            'donations': self.donations,
+            'last_batch_size': self.last_batch_size,
+            'max_batch_size': self.max_batch_size,
+            'avg_batch_size': (
+                self.donations / self.batches if self.batches else 0
+            ),
+        }
+
+    async def _collect(self) -> list:
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_delay
+        while len(batch) < self.max_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(
+                    await asyncio.wait_for(self._queue.get(), timeout)
+                )
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            try:
+                await self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _commit(self, batch: list) -> tuple[list, list]:
+        donations, users, _ = zip(*batch)
+        async with self.session_factory() as session:
+            new_donations, changed_projects = (
+                await donation_crud.create_invested(
+                    list(donations), list(users), session
+                )
+            )
+            results = [
+                DonationCreate.from_orm(new_donation)
+                for new_donation in new_donations
+            ]
+            await funding_book.commit(session, *new_donations)
+        return results, changed_projects
+
+    async def _write(self, batch: list) -> None:
+        '''
+        Записывает пакет одной транзакцией. Если она не удалась, пакет
+        делится пополам и половины пишутся по очереди, пока ошибка
+        не останется у одного пожертвования: остальные запросы пакета
+        получают свои результаты.
+        '''
+        try:
+            results, changed_projects = await self._commit(batch)
+        except Exception as error:
+            if len(batch) > 1:
+                middle = len(batch) // 2
+                await self._write(batch[:middle])
+                await self._write(batch[middle:])
+                return
+            future = batch[0][2]
+            if not future.done():
+                future.set_exception(error)
+            return
+        funding_book.sync_entries(CharityProject, changed_projects)
+        self.batches += 1
+        self.donations += len(batch)
+        self.last_batch_size = len(batch)
+        self.max_batch_size = max(self.max_batch_size, len(batch))
+        for (_, _, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+donation_writer = DonationWriter()
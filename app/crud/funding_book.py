@@ -0,0 +1,161 @@
+from bisect import bisect_left, insort
+from typing import Iterable, Optional, Union
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import CharityProject, Donation
+
+
+class OpenEntry:
+    '''Компактная запись об открытом проекте или пожертвовании.'''
+
+    __slots__ = ('id', 'full_amount', 'invested_amount')
+
+    def __init__(self, id: int, full_amount: int, invested_amount: int):
+        self.id = id
+        self.full_amount = full_amount
+        self.invested_amount = invested_amount or 0
+
+    @property
+    def remains(self) -> int:
+        return self.full_amount - self.invested_amount
+
+
+class OpenQueue:
+    '''
+    FIFO-очередь открытых объектов одной модели, упорядоченная по id.
+
+    Записи хранятся в словаре по id, а порядок задаёт отсортированный
+    список id: новые объекты обычно получают наибольший id и попадают
+    в конец, а id, пришедшие не по порядку (параллельные коммиты
+    на PostgreSQL), вставляются через bisect.
+    '''
+
+    def __init__(self, model):
+        self.model = model
+        self._entries: dict[int, OpenEntry] = {}
+        self._ids: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __iter__(self):
+        return (self._entries[id] for id in self._ids)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._ids.clear()
+
+    def put(self, id: int, full_amount: int, invested_amount: int) -> None:
+        entry = self._entries.get(id)
+        if entry is not None:
+            entry.full_amount = full_amount
+            entry.invested_amount = invested_amount or 0
+            return
+        self._entries[id] = OpenEntry(id, full_amount, invested_amount)
+        insort(self._ids, id)
+
+    def discard(self, id: int) -> None:
+        if self._entries.pop(id, None) is None:
+            return
+        del self._ids[bisect_left(self._ids, id)]
+
+    def pick(self, amount: Optional[int] = None) -> list[int]:
+        '''
+        Возвращает id объектов из головы очереди, которых хватает
+        на распределение суммы amount (или все, если сумма не задана).
+        '''
+        ids = []
+        covered = 0
+        for entry in self:
+            if amount is not None and covered >= amount:
+                break
+            ids.append(entry.id)
+            covered += entry.remains
+        return ids
+
+
+class FundingBook:
+    '''
+    Процессная книга открытых проектов и пожертвований.
+
+    Заполняется один раз при старте приложения и поддерживается
+    в актуальном состоянии эндпоинтами, меняющими суммы.
+    Пока книга не загружена, распределение читает очередь из БД.
+
+    Книга рассчитана на один процесс: изменения других воркеров
+    и app.reconcile в неё не попадают. Если выбранных по книге строк
+    не хватает на сумму, распределение читает очередь из БД.
+    '''
+
+    def __init__(self):
+        self.projects = OpenQueue(CharityProject)
+        self.donations = OpenQueue(Donation)
+        self.loaded = False
+
+    def queue_for(self, model) -> OpenQueue:
+        if issubclass(model, CharityProject):
+            return self.projects
+        return self.donations
+
+    async def load(self, session: AsyncSession) -> None:
+        for queue in (self.projects, self.donations):
+            queue.clear()
+            model = queue.model
+            rows = await session.execute(
+                select(
+                    model.id, model.full_amount, model.invested_amount
+                ).where(model.is_open()).order_by(model.id)
+            )
+            for row in rows:
+                queue.put(*row)
+        self.loaded = True
+
+    def reset(self) -> None:
+        self.projects.clear()
+        self.donations.clear()
+        self.loaded = False
+
+    def sync_entries(self, model, entries: Iterable[OpenEntry]) -> None:
+        if not self.loaded:
+            return
+        queue = self.queue_for(model)
+        for entry in entries:
+            if entry.remains:
+                queue.put(entry.id, entry.full_amount, entry.invested_amount)
+            else:
+                queue.discard(entry.id)
+
+    def discard(self, obj: Union[CharityProject, Donation]) -> None:
+        self.queue_for(type(obj)).discard(obj.id)
+
+    async def commit(
+        self,
+        session: AsyncSession,
+        *objects: Union[CharityProject, Donation]
+    ) -> None:
+        '''
+        Фиксирует транзакцию и переносит итоговые суммы объектов в книгу.
+
+        Состояние снимается после flush (когда у новых объектов уже есть
+        id), а применяется только после успешного commit.
+        '''
+        await session.flush()
+        snapshot = [
+            (type(obj), obj.id, obj.full_amount, obj.invested_amount,
+             obj.fully_invested)
+            for obj in objects
+        ]
+        await session.commit()
+        if not self.loaded:
+            return
+        for model, id, full_amount, invested_amount, closed in snapshot:
+            queue = self.queue_for(model)
+            if closed:
+                queue.discard(id)
+            else:
+                queue.put(id, full_amount, invested_amount)
+
+
+funding_book = FundingBook()
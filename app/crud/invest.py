@@ -1,6 +1,7 @@
 from datetime import datetime
-from typing import Union
+from typing import Optional, Union
 
+from app.crud.funding_book import OpenEntry
 from app.models import CharityProject, Donation
 
 
@@ -35,3 +36,41 @@ def invest(
             target = close_object(target)
             break
     return target, changed_sources
+
+
+def invest_amounts(
+    amounts: list[int],
+    sources: list[OpenEntry],
+    transfers: Optional[list[tuple[int, int, int]]] = None,
+) -> list[int]:
+    '''
+    Распределяет источники sources по суммам amounts в порядке FIFO.
+    Если передан список transfers, в него добавляются ненулевые переводы
+    (индекс суммы в amounts, id источника, вложенная сумма): открытый
+    источник с нулевым остатком только закрывается.
+    '''
+    invested_amounts = []
+    sources = iter(sources)
+    source = next(sources, None)
+    for index, amount in enumerate(amounts):
+        invested = 0
+        while source is not None and invested < amount:
+            sum_to_invest = min(source.remains, amount - invested)
+            source.invested_amount += sum_to_invest
+            invested += sum_to_invest
+            if transfers is not None and sum_to_invest:
+                transfers.append((index, source.id, sum_to_invest))
+            if not source.remains:
+                source = next(sources, None)
+        invested_amounts.append(invested)
+    return invested_amounts
+
+
+def set_invested_amount(
+    target: Union[CharityProject, Donation],
+    invested_amount: int
+) -> Union[CharityProject, Donation]:
+    target.invested_amount = invested_amount
+    if target.invested_amount == target.full_amount:
+        target = close_object(target)
+    return target
@@ -0,0 +1,36 @@
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.base import CRUDBase
+from app.models import Investment
+
+
+class CRUDInvestment(CRUDBase):
+
+    async def get_donation_allocations(
+        self,
+        donation_id: int,
+        fields: list[str],
+        session: AsyncSession,
+        limit: Optional[int] = None,
+        after: Optional[int] = None,
+    ):
+        return await self.get_multi_rows(
+            fields, session, limit, after, donation_id=donation_id
+        )
+
+    async def get_project_funders(
+        self,
+        project_id: int,
+        fields: list[str],
+        session: AsyncSession,
+        limit: Optional[int] = None,
+        after: Optional[int] = None,
+    ):
+        return await self.get_multi_rows(
+            fields, session, limit, after, project_id=project_id
+        )
+
+
+investment_crud = CRUDInvestment(Investment)
@@ -1,8 +1,104 @@
-from fastapi import FastAPI
+from http import HTTPStatus
+from secrets import compare_digest
+from typing import Optional
+
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import PlainTextResponse
 
 from app.api.routers import main_router
 from app.core.config import settings
+from app.core.db import AsyncSessionLocal, get_pool_stats
+from app.core.metrics import MetricsMiddleware, metrics
+from app.core.profiling import ProfilingMiddleware
+from app.core.query_stats import QueryStatsMiddleware
+from app.core.tracing import trace_routes
+from app.core.user import (
+    is_profiling_allowed, password_pool, token_cache, user_cache
+)
+from app.crud.donation_writer import donation_writer
+from app.crud.funding_book import funding_book
 
 app = FastAPI(title=settings.app_title)
 
 app.include_router(main_router)
+
+if settings.sql_instrumentation:
+    app.add_middleware(QueryStatsMiddleware)
+
+if settings.metrics:
+    app.add_middleware(MetricsMiddleware)
+
+if settings.profiling:
+    app.add_middleware(ProfilingMiddleware, authorize=is_profiling_allowed)
+
+
+def collect_pool_stats() -> dict:
+    return {
+        f'engine="{engine}",state="{state}"': value
+        for engine, stats in get_pool_stats().items()
+        for state, value in stats.items()
+        if state != 'pool'
+    }
+
+
+def collect_user_cache_stats() -> dict:
+    return {
+        f'cache="{name}",stat="{stat}"': value
+        for name, cache in (('token', token_cache), ('user', user_cache))
+        for stat, value in cache.stats().items()
+    }
+
+
+def collect_password_pool_stats() -> dict:
+    return {
+        f'stat="{stat}"': value
+        for stat, value in password_pool.stats().items()
+    }
+
+
+metrics.gauges['db_pool_connections'] = collect_pool_stats
+metrics.gauges['user_cache'] = collect_user_cache_stats
+metrics.gauges['password_pool'] = collect_password_pool_stats
+
+
+@app.get('/metrics', include_in_schema=False)
+async def get_metrics(authorization: Optional[str] = Header(None)):
+    # Без METRICS_TOKEN эндпоинт открыт: его нельзя публиковать наружу.
+    if settings.metrics_token and not compare_digest(
+        (authorization or '').encode(),
+        f'Bearer {settings.metrics_token}'.encode(),
+    ):
+        raise HTTPException(status_code=HTTPStatus.UNAUTHORIZED)
+    return PlainTextResponse(
+        metrics.render(), media_type='text/plain; version=0.0.4'
+    )
+
+
+if settings.tracing:
+    trace_routes(app)
+
+
+@app.on_event('startup')
+async def load_funding_book():
+    if settings.funding_book:
+        async with AsyncSessionLocal() as session:
+            await funding_book.load(session)
+
+
+@app.on_event('startup')
+async def start_donation_writer():
+    if settings.donation_writer:
+        donation_writer.session_factory = AsyncSessionLocal
+        donation_writer.max_delay = settings.donation_writer_max_delay
+        donation_writer.max_size = settings.donation_writer_max_size
+        donation_writer.start()
+
+
+@app.on_event('shutdown')
+async def stop_donation_writer():
+    await donation_writer.stop()
+
+
+@app.on_event('shutdown')
+async def stop_password_pool():
+    password_pool.shutdown()
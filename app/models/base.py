@@ -1,6 +1,9 @@
 from datetime import datetime
 
-from sqlalchemy import Boolean, CheckConstraint, Column, DateTime, Integer
+from sqlalchemy import (
+    Boolean, CheckConstraint, Column, DateTime, Index, Integer, false, text
+)
+from sqlalchemy.orm import declared_attr
 
 from app.core.db import Base
 
@@ -8,16 +11,33 @@ from app.core.db import Base
 class BaseDonation(Base):
 
     __abstract__ = True
-    __table_args__ = (
-        CheckConstraint("full_amount >= invested_amount"),
-    )
-
-    full_amount = Column(
-        Integer,
-        CheckConstraint("full_amount > 0"),
-        nullable=False
-    )
+
+    @declared_attr
+    def __table_args__(cls):
+        return (
+            CheckConstraint(
+                'full_amount > 0',
+                name=f'ck_{cls.__tablename__}_full_amount_positive'
+            ),
+            CheckConstraint(
+                'full_amount >= invested_amount',
+                name=f'ck_{cls.__tablename__}_invested_not_above_full'
+            ),
+            # Частичный индекс очереди открытых объектов (FIFO по id).
+            Index(
+                f'ix_{cls.__tablename__}_open',
+                'id',
+                sqlite_where=text('fully_invested = 0'),
+                postgresql_where=text('fully_invested = false'),
+            ),
+        )
+
+    full_amount = Column(Integer, nullable=False)
     invested_amount = Column(Integer, default=0, nullable=False)
     fully_invested = Column(Boolean, default=False)
-    create_date = Column(DateTime, default=datetime.now)
+    create_date = Column(DateTime, default=datetime.now, index=True)
     close_date = Column(DateTime)
+
+    @classmethod
+    def is_open(cls):
+        return cls.fully_invested == false()
@@ -4,5 +4,5 @@ from app.models.base import BaseDonation
 
 
 class Donation(BaseDonation):
-    user_id = Column(Integer, ForeignKey('user.id'))
+    user_id = Column(Integer, ForeignKey('user.id'), index=True)
     comment = Column(Text)
@@ -0,0 +1,32 @@
+from datetime import datetime
+
+from sqlalchemy import (
+    CheckConstraint, Column, DateTime, ForeignKey, Index, Integer
+)
+
+from app.core.db import Base
+
+
+class Investment(Base):
+    '''Журнал распределения: сколько пожертвование вложило в проект.'''
+
+    __table_args__ = (
+        CheckConstraint('amount > 0', name='ck_investment_amount_positive'),
+        # Покрывающие индексы: выборка по пожертвованию или проекту
+        # с курсором по id читает только индекс.
+        Index(
+            'ix_investment_donation',
+            'donation_id', 'id', 'project_id', 'amount', 'created_at',
+        ),
+        Index(
+            'ix_investment_project',
+            'project_id', 'id', 'donation_id', 'amount', 'created_at',
+        ),
+    )
+
+    donation_id = Column(Integer, ForeignKey('donation.id'), nullable=False)
+    project_id = Column(
+        Integer, ForeignKey('charityproject.id'), nullable=False
+    )
+    amount = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.now, nullable=False)
@@ -0,0 +1,299 @@
+'''
+Сверка сумм проектов и пожертвований с распределением FIFO по всей истории.
+
+Столбцы full_amount обеих таблиц загружаются в массивы NumPy, и распределение
+считается сразу для всей истории: деньги пожертвований и потребности проектов
+выкладываются на две числовые оси накопленных сумм (в порядке id), и k-й рубль
+пожертвований достаётся k-му рублю проектов. Это совпадает с поочерёдным
+invest(), если суммы не правили вручную. Проект закрывает то пожертвование,
+на которое по searchsorted приходится конец проекта на оси пожертвований
+(и наоборот), поэтому дата закрытия — более поздняя из дат их создания.
+
+Отчёт показывает объекты, у которых invested_amount или fully_invested
+расходятся с расчётом. С --fix исправленные значения записываются пакетами
+UPDATE по --chunk-size строк. С --rebuild-ledger журнал investment
+заполняется заново по расчёту. После записи перезапустите приложение:
+книга открытых объектов загружается только при старте.
+
+Запуск:  python -m app.reconcile [--fix] [--rebuild-ledger]
+'''
+import argparse
+import asyncio
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import case, delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.db import make_engine
+from app.models import CharityProject, Donation, Investment
+
+DEFAULT_CHUNK_SIZE = 500
+DEFAULT_REPORT_LIMIT = 20
+
+
+def to_datetime(value: np.datetime64) -> Optional[datetime]:
+    return None if np.isnat(value) else value.astype('datetime64[us]').item()
+
+
+class Snapshot:
+    '''Столбцы одной таблицы в массивах NumPy, упорядоченные по id.'''
+
+    __slots__ = (
+        'model', 'ids', 'full_amounts', 'invested_amounts', 'closed',
+        'create_dates',
+    )
+
+    def __init__(
+        self,
+        model,
+        rows: list[tuple[int, int, Optional[int], Optional[bool], datetime]],
+    ):
+        self.model = model
+        ids, full_amounts, invested_amounts, closed, create_dates = (
+            zip(*rows) if rows else ((),) * 5
+        )
+        self.ids = np.array(ids, dtype=np.int64)
+        self.full_amounts = np.array(full_amounts, dtype=np.int64)
+        self.invested_amounts = np.array(
+            [amount or 0 for amount in invested_amounts], dtype=np.int64
+        )
+        self.closed = np.array(
+            [bool(value) for value in closed], dtype=bool
+        )
+        self.create_dates = np.array(create_dates, dtype='datetime64[us]')
+
+    @classmethod
+    async def load(cls, model, session: AsyncSession) -> 'Snapshot':
+        rows = await session.execute(
+            select(
+                model.id, model.full_amount, model.invested_amount,
+                model.fully_invested, model.create_date,
+            ).order_by(model.id)
+        )
+        return cls(model, rows.all())
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def ends(self) -> np.ndarray:
+        '''Конец каждого объекта на оси накопленных сумм.'''
+        return np.cumsum(self.full_amounts)
+
+
+class Allocation:
+    '''Ожидаемое состояние одной таблицы после FIFO-распределения.'''
+
+    __slots__ = ('snapshot', 'invested_amounts', 'closed', 'close_dates')
+
+    def __init__(self, snapshot: Snapshot, other: Snapshot):
+        ends = snapshot.ends
+        other_ends = other.ends
+        matched = min(
+            ends[-1] if len(ends) else 0,
+            other_ends[-1] if len(other_ends) else 0,
+        )
+        starts = ends - snapshot.full_amounts
+        self.snapshot = snapshot
+        self.invested_amounts = np.clip(
+            np.minimum(ends, matched) - starts, 0, None
+        )
+        self.closed = ends <= matched
+        # Объект закрывает первый объект другой таблицы, чей конец
+        # на оси не меньше конца этого объекта.
+        closing = np.searchsorted(other_ends, ends[self.closed], side='left')
+        self.close_dates = np.full(
+            len(snapshot), np.datetime64('NaT'), dtype='datetime64[us]'
+        )
+        self.close_dates[self.closed] = np.maximum(
+            snapshot.create_dates[self.closed], other.create_dates[closing]
+        )
+
+    def discrepancies(self) -> np.ndarray:
+        '''Позиции объектов, суммы или статус которых расходятся с расчётом.'''
+        stored = self.snapshot
+        return np.flatnonzero(np.logical_or(
+            self.invested_amounts != stored.invested_amounts,
+            self.closed != stored.closed,
+        ))
+
+
+def allocate_history(
+    projects: Snapshot, donations: Snapshot
+) -> tuple[Allocation, Allocation]:
+    return (
+        Allocation(projects, donations), Allocation(donations, projects)
+    )
+
+
+def get_transfers(
+    projects: Snapshot, donations: Snapshot
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    Переводы FIFO-распределения: отрезки между соседними концами объектов
+    обеих таблиц. Возвращает id проектов, id пожертвований, суммы и даты.
+    '''
+    project_ends = projects.ends
+    donation_ends = donations.ends
+    if not len(project_ends) or not len(donation_ends):
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, empty, np.array([], dtype='datetime64[us]')
+    matched = min(project_ends[-1], donation_ends[-1])
+    breaks = np.union1d(project_ends, donation_ends)
+    breaks = breaks[breaks <= matched]
+    starts = np.concatenate(([0], breaks[:-1]))
+    project_positions = np.searchsorted(project_ends, starts, side='right')
+    donation_positions = np.searchsorted(donation_ends, starts, side='right')
+    return (
+        projects.ids[project_positions],
+        donations.ids[donation_positions],
+        breaks - starts,
+        np.maximum(
+            projects.create_dates[project_positions],
+            donations.create_dates[donation_positions],
+        ),
+    )
+
+
+async def write_fixes(
+    allocation: Allocation,
+    positions: np.ndarray,
+    session: AsyncSession,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> None:
+    '''Записывает расчётные значения для positions пакетами UPDATE.'''
+    model = allocation.snapshot.model
+    for chunk_start in range(0, len(positions), chunk_size):
+        chunk = positions[chunk_start:chunk_start + chunk_size]
+        ids = allocation.snapshot.ids[chunk].tolist()
+        closed_ids = allocation.snapshot.ids[
+            chunk[allocation.closed[chunk]]
+        ].tolist()
+        close_dates = {
+            id: to_datetime(close_date)
+            for id, close_date in zip(ids, allocation.close_dates[chunk])
+            if not np.isnat(close_date)
+        }
+        await session.execute(
+            update(model).where(model.id.in_(ids)).values(
+                invested_amount=case(
+                    dict(zip(
+                        ids, allocation.invested_amounts[chunk].tolist()
+                    )),
+                    value=model.id,
+                ),
+                fully_invested=model.id.in_(closed_ids),
+                close_date=case(
+                    close_dates, value=model.id, else_=None
+                ) if close_dates else None,
+            ).execution_options(synchronize_session=False)
+        )
+
+
+async def rebuild_ledger(
+    projects: Snapshot,
+    donations: Snapshot,
+    session: AsyncSession,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> int:
+    '''Заменяет журнал investment переводами из расчёта.'''
+    project_ids, donation_ids, amounts, created = get_transfers(
+        projects, donations
+    )
+    await session.execute(delete(Investment))
+    for chunk_start in range(0, len(amounts), chunk_size):
+        chunk = slice(chunk_start, chunk_start + chunk_size)
+        await session.execute(insert(Investment), [
+            {
+                'project_id': project_id,
+                'donation_id': donation_id,
+                'amount': amount,
+                'created_at': to_datetime(created_at),
+            }
+            for project_id, donation_id, amount, created_at in zip(
+                project_ids[chunk].tolist(),
+                donation_ids[chunk].tolist(),
+                amounts[chunk].tolist(),
+                created[chunk],
+            )
+        ])
+    return len(amounts)
+
+
+def report(
+    allocation: Allocation, positions: np.ndarray, limit: int
+) -> None:
+    snapshot = allocation.snapshot
+    print(
+        f'{snapshot.model.__tablename__}: {len(snapshot)} объектов, '
+        f'расхождений: {len(positions)}'
+    )
+    for position in positions[:limit]:
+        print(
+            f'  id={snapshot.ids[position]}: '
+            f'invested_amount {snapshot.invested_amounts[position]} -> '
+            f'{allocation.invested_amounts[position]}, '
+            f'fully_invested {snapshot.closed[position]} -> '
+            f'{allocation.closed[position]}'
+        )
+    if len(positions) > limit:
+        print(f'  ... и ещё {len(positions) - limit}')
+
+
+async def reconcile(args) -> int:
+    engine = make_engine(args.url)
+    try:
+        async with AsyncSession(engine) as session:
+            projects = await Snapshot.load(CharityProject, session)
+            donations = await Snapshot.load(Donation, session)
+            allocations = allocate_history(projects, donations)
+            found = 0
+            for allocation in allocations:
+                positions = allocation.discrepancies()
+                report(allocation, positions, args.limit)
+                found += len(positions)
+                if args.fix:
+                    await write_fixes(
+                        allocation, positions, session, args.chunk_size
+                    )
+            if args.rebuild_ledger:
+                transfers = await rebuild_ledger(
+                    projects, donations, session, args.chunk_size
+                )
+                print(f'investment: записано переводов: {transfers}')
+            await session.commit()
+    finally:
+        await engine.dispose()
+    return found
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument('--url', default=settings.database_url)
+    parser.add_argument(
+        '--fix', action='store_true', help='записать расчётные значения'
+    )
+    parser.add_argument(
+        '--rebuild-ledger', action='store_true',
+        help='заполнить журнал investment по расчёту',
+    )
+    parser.add_argument(
+        '--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE
+    )
+    parser.add_argument(
+        '--limit', type=int, default=DEFAULT_REPORT_LIMIT,
+        help='сколько расхождений показать по каждой таблице',
+    )
+    args = parser.parse_args()
+    found = asyncio.run(reconcile(args))
+    # Код 1 без --fix удобен для проверок по расписанию.
+    raise SystemExit(1 if found and not args.fix else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -51,3 +51,14 @@ class CharityProjectDB(CharityProjectCreate):
 
 class CharityProjectUpdate(CharityProjectBase):
     pass
+
+
+class CharityProjectBatchError(BaseModel):
+    index: int
+    name: str
+    detail: str
+
+
+class CharityProjectBatchResult(BaseModel):
+    created: list[CharityProjectDB]
+    errors: list[CharityProjectBatchError]
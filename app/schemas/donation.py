@@ -21,4 +21,14 @@ class DonationDB(DonationCreate):
     user_id: int
     invested_amount: int = Field(0)
     fully_invested: bool
-    close_date: Optional[datetime]
\ No newline at end of file
+    close_date: Optional[datetime]
+
+
+class DonationWriterStats(BaseModel):
+    running: bool
+    queue_depth: int
+    batches: int
+    donations: int
+    last_batch_size: int
+    max_batch_size: int
+    avg_batch_size: float
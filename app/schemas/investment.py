@@ -0,0 +1,20 @@
+from datetime import datetime
+
+from pydantic import BaseModel
+
+
+class InvestmentBase(BaseModel):
+    id: int
+    amount: int
+    created_at: datetime
+
+    class Config:
+        orm_mode = True
+
+
+class DonationAllocation(InvestmentBase):
+    project_id: int
+
+
+class ProjectFunder(InvestmentBase):
+    donation_id: int
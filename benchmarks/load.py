@@ -0,0 +1,497 @@
+'''
+Нагрузочный прогон QRKot: воспроизведение журнала запросов (JSONL)
+или синтетическая смесь регистраций, логинов, пожертвований, списков
+и админских операций с проектами.
+
+Приложение app.main.app вызывается в том же процессе (на временной
+базе SQLite) или по HTTP через запущенный uvicorn (--url). По итогам
+выводятся пропускная способность и p50/p95/p99 по шаблонам маршрутов,
+а затем проверяются инварианты распределения средств.
+
+Строка журнала: {"method": "POST", "path": "/donation/",
+"json": {"full_amount": 100}, "auth": "user"}; auth — user, admin или null.
+
+Запуск:
+    python -m benchmarks.load --requests 5000 --concurrency 50
+    python -m benchmarks.load --log traffic.jsonl --rate 200
+    python -m benchmarks.load --url http://127.0.0.1:8000 \\
+        --admin-email admin@qrkot.com --admin-password secret
+'''
+import argparse
+import asyncio
+import json
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+from pathlib import Path
+from typing import AsyncIterator, Optional
+from urllib.parse import urlencode
+
+import requests
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.core.base import Base
+from app.core.db import get_async_session, make_engine
+from app.core.password import hash_password
+from app.main import app
+
+USER_PASSWORD = 'chimichangas4life'
+ADMIN_EMAIL = 'admin@qrkot.com'
+WEIGHTS = {
+    'donate': 40,
+    'list_projects': 25,
+    'my_donations': 15,
+    'admin_create': 10,
+    'admin_patch': 5,
+    'list_donations': 5,
+}
+
+
+class Response:
+    __slots__ = ('status', 'body')
+
+    def __init__(self, status: int, body: bytes):
+        self.status = status
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body)
+
+
+def encode_body(
+    json_body=None, form: Optional[dict] = None
+) -> tuple[bytes, Optional[str]]:
+    if form is not None:
+        return urlencode(form).encode(), 'application/x-www-form-urlencoded'
+    if json_body is not None:
+        return json.dumps(json_body).encode(), 'application/json'
+    return b'', None
+
+
+class AsgiTransport:
+    '''Вызывает ASGI-приложение напрямую, без сети.'''
+
+    def __init__(self, asgi_app):
+        self.app = asgi_app
+
+    async def request(
+        self, method, path, json_body=None, form=None, token=None
+    ) -> Response:
+        body, content_type = encode_body(json_body, form)
+        path, _, query = path.partition('?')
+        headers = [(b'host', b'testserver')]
+        if content_type:
+            headers.append((b'content-type', content_type.encode()))
+        headers.append((b'content-length', str(len(body)).encode()))
+        if token:
+            headers.append((b'authorization', f'Bearer {token}'.encode()))
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': method,
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': query.encode(),
+            'root_path': '',
+            'headers': headers,
+            'client': ('127.0.0.1', 50000),
+            'server': ('testserver', 80),
+        }
+        messages = [{'type': 'http.request', 'body': body}]
+        status, chunks = 500, []
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await asyncio.Event().wait()
+
+        async def send(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = int(message['status'])
+            elif message['type'] == 'http.response.body':
+                chunks.append(message.get('body', b''))
+
+        await self.app(scope, receive, send)
+        return Response(status, b''.join(chunks))
+
+    async def close(self):
+        pass
+
+
+class HttpTransport:
+    '''HTTP-клиент к запущенному серверу; requests работает в пуле потоков.'''
+
+    def __init__(self, base_url: str, concurrency: int):
+        self.base_url = base_url.rstrip('/')
+        self.executor = ThreadPoolExecutor(concurrency)
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=concurrency)
+        self.session.mount('http://', adapter)
+
+    def send(self, method, path, json_body, form, token) -> Response:
+        body, content_type = encode_body(json_body, form)
+        headers = {}
+        if content_type:
+            headers['Content-Type'] = content_type
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        response = self.session.request(
+            method, self.base_url + path, data=body, headers=headers
+        )
+        return Response(response.status_code, response.content)
+
+    async def request(
+        self, method, path, json_body=None, form=None, token=None
+    ) -> Response:
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, self.send, method, path, json_body, form, token
+        )
+
+    async def close(self):
+        self.executor.shutdown()
+
+
+def get_route_template(method: str, path: str) -> str:
+    path = path.partition('?')[0]
+    for route in app.routes:
+        methods = getattr(route, 'methods', None) or ()
+        if method in methods and route.path_regex.match(path):
+            return f'{method} {route.path}'
+    return f'{method} {path}'
+
+
+class Recorder:
+    def __init__(self):
+        self.latency: dict[str, list[float]] = {}
+        self.statuses: dict[str, dict[int, int]] = {}
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def add(self, route: str, status: int, elapsed: float) -> None:
+        self.latency.setdefault(route, []).append(elapsed)
+        statuses = self.statuses.setdefault(route, {})
+        statuses[status] = statuses.get(status, 0) + 1
+
+    def report(self) -> dict:
+        self.finished = self.finished or time.perf_counter()
+        duration = self.finished - self.started
+        routes = {}
+        for route, timings in sorted(self.latency.items()):
+            timings = sorted(timings)
+            routes[route] = {
+                'count': len(timings),
+                'rps': len(timings) / duration,
+                'p50_ms': percentile(timings, 0.5),
+                'p95_ms': percentile(timings, 0.95),
+                'p99_ms': percentile(timings, 0.99),
+                'statuses': self.statuses[route],
+            }
+        total = sum(len(timings) for timings in self.latency.values())
+        return {
+            'duration_s': duration,
+            'requests': total,
+            'rps': total / duration,
+            'routes': routes,
+        }
+
+
+def percentile(timings: list[float], share: float) -> float:
+    index = min(len(timings) - 1, int(len(timings) * share))
+    return timings[index] * 1000
+
+
+class Client:
+    '''Транспорт, токены участников и запись замеров.'''
+
+    def __init__(self, transport, recorder: Recorder):
+        self.transport = transport
+        self.recorder = recorder
+        self.tokens: dict[str, list[str]] = {'user': [], 'admin': []}
+        self.rng = random.Random(0)
+
+    def token_for(self, auth: Optional[str]) -> Optional[str]:
+        if not auth or not self.tokens.get(auth):
+            return None
+        return self.rng.choice(self.tokens[auth])
+
+    async def request(
+        self, method, path, json_body=None, form=None, auth=None,
+        record=True,
+    ) -> Response:
+        started = time.perf_counter()
+        response = await self.transport.request(
+            method, path, json_body, form, self.token_for(auth)
+        )
+        if record:
+            self.recorder.add(
+                get_route_template(method, path), response.status,
+                time.perf_counter() - started,
+            )
+        return response
+
+    async def login(self, email: str, password: str) -> Optional[str]:
+        response = await self.request('POST', '/auth/jwt/login', form={
+            'username': email, 'password': password,
+        })
+        if response.status != 200:
+            return None
+        return response.json()['access_token']
+
+    async def register_users(self, users: int, concurrency: int) -> None:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def register(number):
+            email = f'user{number}@load.qrkot'
+            async with semaphore:
+                await self.request('POST', '/auth/register', json_body={
+                    'email': email, 'password': USER_PASSWORD,
+                })
+                token = await self.login(email, USER_PASSWORD)
+            if token:
+                self.tokens['user'].append(token)
+
+        await asyncio.gather(*(register(number) for number in range(users)))
+
+
+async def synthesize(
+    client: Client, total: int, seed: int
+) -> AsyncIterator[tuple]:
+    '''Смешанная нагрузка; созданные проекты потом редактируются.'''
+    rng = random.Random(seed)
+    names = count(1)
+    operations, weights = zip(*WEIGHTS.items())
+    created: list[int] = []
+    for _ in range(total):
+        operation = rng.choices(operations, weights)[0]
+        if operation == 'admin_patch' and not created:
+            operation = 'admin_create'
+        if operation == 'donate':
+            yield ('POST', '/donation/', {
+                'full_amount': rng.randint(1, 1000)
+            }, 'user', None)
+        elif operation == 'list_projects':
+            yield ('GET', '/charity_project/', None, None, None)
+        elif operation == 'my_donations':
+            yield ('GET', '/donation/my', None, 'user', None)
+        elif operation == 'list_donations':
+            yield ('GET', '/donation/', None, 'admin', None)
+        elif operation == 'admin_create':
+            yield ('POST', '/charity_project/', {
+                'name': f'load_{seed}_{next(names)}',
+                'description': 'Load test',
+                'full_amount': rng.randint(100, 5000),
+            }, 'admin', created)
+        else:
+            yield ('PATCH', f'/charity_project/{rng.choice(created)}', {
+                'description': f'Load test {rng.random()}',
+            }, 'admin', None)
+
+
+async def replay(path: Path) -> AsyncIterator[tuple]:
+    with open(path) as log:
+        for line in log:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            yield (
+                entry['method'].upper(), entry['path'], entry.get('json'),
+                entry.get('auth'), None,
+            )
+
+
+async def drive(
+    client: Client, workload: AsyncIterator[tuple], concurrency: int,
+    rate: Optional[float],
+) -> None:
+    '''
+    Выполняет запросы workload в concurrency параллельных воркерах;
+    с rate запросы стартуют не чаще rate в секунду.
+    '''
+    lock = asyncio.Lock()
+    sequence = count()
+    started = time.perf_counter()
+
+    async def worker():
+        while True:
+            async with lock:
+                try:
+                    method, path, body, auth, created = (
+                        await workload.__anext__()
+                    )
+                except StopAsyncIteration:
+                    return
+                number = next(sequence)
+            if rate:
+                delay = started + number / rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            response = await client.request(
+                method, path, json_body=body, auth=auth
+            )
+            if created is not None and response.status == 200:
+                created.append(response.json()['id'])
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+def check_invariants(projects: list[dict], donations: list[dict]) -> list:
+    '''Проверяет согласованность сумм после прогона.'''
+    errors = []
+    for kind, objects in (('project', projects), ('donation', donations)):
+        for obj in objects:
+            invested, full = obj['invested_amount'], obj['full_amount']
+            if not 0 <= invested <= full:
+                errors.append(f'{kind} {obj["id"]}: invested {invested}')
+            if obj['fully_invested'] != (invested == full):
+                errors.append(f'{kind} {obj["id"]}: fully_invested flag')
+            if obj['fully_invested'] != (obj['close_date'] is not None):
+                errors.append(f'{kind} {obj["id"]}: close_date')
+    projects_total = sum(obj['invested_amount'] for obj in projects)
+    donations_total = sum(obj['invested_amount'] for obj in donations)
+    if projects_total != donations_total:
+        errors.append(
+            f'invested in projects {projects_total} != '
+            f'invested from donations {donations_total}'
+        )
+    if any(
+        not obj['fully_invested'] for obj in projects
+    ) and any(not obj['fully_invested'] for obj in donations):
+        errors.append('open projects and open donations coexist')
+    return errors
+
+
+async def verify(client: Client) -> list:
+    projects = await client.request(
+        'GET', '/charity_project/?all=true', record=False
+    )
+    donations = await client.request(
+        'GET', '/donation/?all=true', auth='admin', record=False
+    )
+    if projects.status != 200 or donations.status != 200:
+        return [
+            'cannot read projects/donations: '
+            f'{projects.status}/{donations.status}'
+        ]
+    return check_invariants(projects.json(), donations.json())
+
+
+def prepare_database(path: Path) -> None:
+    engine = create_engine(f'sqlite:///{path}')
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    connection = sqlite3.connect(path)
+    connection.execute(
+        'INSERT INTO user (email, hashed_password, is_active, '
+        'is_superuser, is_verified) VALUES (?, ?, 1, 1, 1)',
+        (ADMIN_EMAIL, hash_password(USER_PASSWORD)),
+    )
+    connection.commit()
+    connection.close()
+
+
+def use_database(path: Path) -> None:
+    engine = make_engine(f'sqlite+aiosqlite:///{path}')
+    session_factory = sessionmaker(
+        engine, class_=AsyncSession, expire_on_commit=False
+    )
+
+    async def get_load_session():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides = {get_async_session: get_load_session}
+
+
+async def run(args) -> int:
+    recorder = Recorder()
+    if args.url:
+        transport = HttpTransport(args.url, args.concurrency)
+        admin_email, admin_password = args.admin_email, args.admin_password
+    else:
+        directory = tempfile.TemporaryDirectory()
+        path = Path(directory.name) / 'load.db'
+        prepare_database(path)
+        use_database(path)
+        await app.router.startup()
+        transport = AsgiTransport(app)
+        admin_email, admin_password = ADMIN_EMAIL, USER_PASSWORD
+    client = Client(transport, recorder)
+    try:
+        if admin_email:
+            token = await client.login(admin_email, admin_password)
+            if token:
+                client.tokens['admin'].append(token)
+        await client.register_users(args.users, args.concurrency)
+        workload = (
+            replay(Path(args.log)) if args.log
+            else synthesize(client, args.requests, args.seed)
+        )
+        await drive(client, workload, args.concurrency, args.rate)
+        recorder.finished = time.perf_counter()
+        errors = await verify(client)
+    finally:
+        await transport.close()
+        if not args.url:
+            await app.router.shutdown()
+            app.dependency_overrides = {}
+            directory.cleanup()
+    report = recorder.report()
+    report['invariant_errors'] = errors
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+    print_report(report)
+    return 1 if errors else 0
+
+
+def print_report(report: dict) -> None:
+    print(
+        f'{report["requests"]} requests in {report["duration_s"]:.2f} s, '
+        f'{report["rps"]:.1f} req/s'
+    )
+    print(
+        f'{"route":<42} {"count":>7} {"req/s":>8} {"p50":>8} '
+        f'{"p95":>8} {"p99":>8}  statuses'
+    )
+    for route, stats in report['routes'].items():
+        print(
+            f'{route:<42} {stats["count"]:7d} {stats["rps"]:8.1f} '
+            f'{stats["p50_ms"]:8.2f} {stats["p95_ms"]:8.2f} '
+            f'{stats["p99_ms"]:8.2f}  {stats["statuses"]}'
+        )
+    if report['invariant_errors']:
+        print('\nINVARIANT VIOLATIONS:')
+        for error in report['invariant_errors'][:50]:
+            print(f'  {error}')
+    else:
+        print('\nfunding invariants: OK')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument('--url', help='адрес запущенного сервера')
+    parser.add_argument('--admin-email')
+    parser.add_argument('--admin-password')
+    parser.add_argument('--log', help='журнал запросов в формате JSONL')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--rate', type=float, help='запросов в секунду')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output')
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == '__main__':
+    main()
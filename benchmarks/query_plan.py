@@ -0,0 +1,129 @@
+'''
+Планы и время запросов очереди пожертвований до и после индексов
+ревизии cb64eb5eb105 (частичный индекс открытых объектов) и 768feeebad3a
+(индекс donation.user_id).
+
+Запуск: python -m benchmarks.query_plan --rows 1000000
+'''
+import argparse
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.dialects import sqlite
+
+from app.core.base import Base, Donation
+from app.crud.donation import donation_crud
+
+INDEXES = ('ix_donation_open', 'ix_donation_user_id')
+USERS = 1000
+
+
+def compile_query(query) -> str:
+    return str(query.compile(
+        dialect=sqlite.dialect(), compile_kwargs={'literal_binds': True}
+    ))
+
+
+def get_queries(chunk_size: int) -> dict[str, str]:
+    return {
+        'open_queue': compile_query(
+            select(Donation).where(Donation.is_open()).order_by(Donation.id)
+        ),
+        'open_chunk': compile_query(
+            donation_crud.get_open_chunk_query(limit=chunk_size)
+        ),
+        'by_user': compile_query(
+            select(Donation).where(
+                Donation.user_id == USERS // 2
+            ).order_by(Donation.id)
+        ),
+    }
+
+
+def seed(path: Path, rows: int, open_share: float) -> None:
+    engine = create_engine(f'sqlite:///{path}')
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    first_open = int(rows * (1 - open_share))
+    connection = sqlite3.connect(path)
+    for index in INDEXES:
+        connection.execute(f'DROP INDEX {index}')
+    connection.executemany(
+        'INSERT INTO donation (id, full_amount, invested_amount, '
+        'fully_invested, user_id) VALUES (?, ?, ?, ?, ?)',
+        (
+            (
+                number,
+                amount,
+                amount if number < first_open else 0,
+                number < first_open,
+                random.randint(1, USERS),
+            )
+            for number, amount in (
+                (number, random.randint(1, 1000))
+                for number in range(1, rows + 1)
+            )
+        ),
+    )
+    connection.commit()
+    connection.close()
+
+
+def measure(
+    connection: sqlite3.Connection, queries: dict[str, str], repeat: int
+) -> dict[str, tuple[str, float]]:
+    results = {}
+    for name, query in queries.items():
+        plan = '; '.join(
+            row[-1] for row in connection.execute(
+                f'EXPLAIN QUERY PLAN {query}'
+            )
+        )
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            connection.execute(query).fetchall()
+            timings.append(time.perf_counter() - started)
+        results[name] = (plan, statistics.median(timings) * 1000)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--open-share', type=float, default=0.01)
+    parser.add_argument('--chunk-size', type=int, default=64)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    queries = get_queries(args.chunk_size)
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / 'query_plan.db'
+        seed(path, args.rows, args.open_share)
+        connection = sqlite3.connect(path)
+        connection.execute('ANALYZE')
+        before = measure(connection, queries, args.repeat)
+        engine = create_engine(f'sqlite:///{path}')
+        with engine.begin() as engine_connection:
+            for index in Donation.__table__.indexes:
+                if index.name in INDEXES:
+                    index.create(engine_connection)
+        engine.dispose()
+        connection.execute('ANALYZE')
+        after = measure(connection, queries, args.repeat)
+        connection.close()
+    print(f'rows={args.rows} open_share={args.open_share}')
+    for name in queries:
+        print(f'\n[{name}]')
+        for label, (plan, elapsed) in (
+            ('before', before[name]), ('after', after[name])
+        ):
+            print(f'  {label:<6} {elapsed:10.2f} ms  {plan}')
+
+
+if __name__ == '__main__':
+    main()
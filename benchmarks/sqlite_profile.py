@@ -0,0 +1,103 @@
+'''
+Конкурентная запись пожертвований в SQLite с разными профилями прагм.
+
+Каждый воркер в цикле создаёт пожертвование и читает открытую очередь;
+считаются пропускная способность и ошибки `database is locked`.
+
+Запуск: python -m benchmarks.sqlite_profile --workers 16 --requests 200
+'''
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import OperationalError
+
+from app.core.base import Base, Donation
+from app.core.config import settings
+from app.core.db import make_engine
+
+PROFILES = {
+    'default': {},
+    'busy_timeout': {'busy_timeout': settings.sqlite_busy_timeout},
+    'wal': {
+        'journal_mode': 'WAL',
+        'busy_timeout': settings.sqlite_busy_timeout,
+    },
+    'tuned': {
+        'journal_mode': settings.sqlite_journal_mode,
+        'synchronous': settings.sqlite_synchronous,
+        'mmap_size': settings.sqlite_mmap_size,
+        'cache_size': settings.sqlite_cache_size,
+        'busy_timeout': settings.sqlite_busy_timeout,
+        'temp_store': settings.sqlite_temp_store,
+    },
+}
+
+
+async def worker(engine, requests: int, timings: list, errors: list):
+    for _ in range(requests):
+        started = time.perf_counter()
+        try:
+            async with engine.begin() as connection:
+                await connection.execute(insert(Donation).values(
+                    full_amount=100, invested_amount=0,
+                    fully_invested=False, user_id=1,
+                ))
+                await connection.execute(
+                    select(Donation.id).where(
+                        Donation.is_open()
+                    ).order_by(Donation.id).limit(10)
+                )
+        except OperationalError:
+            errors.append(1)
+            continue
+        timings.append(time.perf_counter() - started)
+
+
+async def run_profile(
+    path: Path, pragmas: dict, workers: int, requests: int
+) -> dict:
+    engine = make_engine(f'sqlite+aiosqlite:///{path}', pragmas)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    timings, errors = [], []
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        worker(engine, requests, timings, errors) for _ in range(workers)
+    ))
+    elapsed = time.perf_counter() - started
+    await engine.dispose()
+    timings.sort()
+    return {
+        'rps': len(timings) / elapsed,
+        'p50': statistics.median(timings) * 1000 if timings else 0,
+        'p99': timings[int(len(timings) * 0.99)] * 1000 if timings else 0,
+        'errors': len(errors),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+    print(f'workers={args.workers} requests={args.requests}')
+    with tempfile.TemporaryDirectory() as directory:
+        for name, pragmas in PROFILES.items():
+            result = await run_profile(
+                Path(directory) / f'{name}.db', pragmas,
+                args.workers, args.requests,
+            )
+            print(
+                f'{name:<13} {result["rps"]:9.1f} req/s  '
+                f'p50 {result["p50"]:7.2f} ms  p99 {result["p99"]:8.2f} ms  '
+                f'errors {result["errors"]}'
+            )
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,306 @@
+'''
+Бенчмарки распределения пожертвований и эндпоинтов записи и чтения.
+
+Для каждого размера очереди (открытых проектов или пожертвований)
+и распределения сумм создаётся временная база SQLite, после чего
+измеряются invest()/invest_amounts() сами по себе, POST /donation/,
+POST /charity_project/ и списки через ASGI-клиент в том же процессе.
+
+Запуск:  python -m benchmarks.suite run --sizes 1000 100000 -o new.json
+Сравнение: python -m benchmarks.suite compare base.json new.json
+'''
+import argparse
+import json
+import platform
+import random
+import re
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.core.base import Base, CharityProject, Donation
+from app.core.db import get_async_session, get_read_session, make_engine
+from app.core.user import current_superuser, current_user
+from app.crud.funding_book import OpenEntry
+from app.crud.invest import invest, invest_amounts
+from app.main import app
+from app.models import User
+
+DISTRIBUTIONS: dict[str, Callable[[random.Random], int]] = {
+    'uniform': lambda rng: rng.randint(1, 1000),
+    'lognormal': lambda rng: max(1, int(rng.lognormvariate(5, 1.5))),
+    'constant': lambda rng: 100,
+}
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_THRESHOLD = 0.2
+QUERIES_PATTERN = re.compile(r'desc="(\d+) queries"')
+
+benchmark_user = User(
+    id=1, is_active=True, is_verified=True, is_superuser=True
+)
+
+
+def amounts(distribution: str, count: int, seed: int = 0) -> list[int]:
+    rng = random.Random(seed)
+    generate = DISTRIBUTIONS[distribution]
+    return [generate(rng) for _ in range(count)]
+
+
+def seed_backlog(path: Path, model, full_amounts: list[int]) -> None:
+    '''Заполняет таблицу model открытыми объектами с суммами full_amounts.'''
+    engine = create_engine(f'sqlite:///{path}')
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    connection = sqlite3.connect(path)
+    now = datetime.now().isoformat(sep=' ')
+    if model is CharityProject:
+        connection.executemany(
+            'INSERT INTO charityproject (id, name, description, full_amount, '
+            'invested_amount, fully_invested, create_date) '
+            'VALUES (?, ?, ?, ?, 0, 0, ?)',
+            (
+                (number, f'project_{number}', 'Benchmark', amount, now)
+                for number, amount in enumerate(full_amounts, start=1)
+            ),
+        )
+    else:
+        connection.executemany(
+            'INSERT INTO donation (id, full_amount, invested_amount, '
+            'fully_invested, create_date, user_id) VALUES (?, ?, 0, 0, ?, 1)',
+            (
+                (number, amount, now)
+                for number, amount in enumerate(full_amounts, start=1)
+            ),
+        )
+    connection.commit()
+    connection.close()
+
+
+def summarize(timings: list[float], queries: list[int]) -> dict:
+    timings = sorted(timings)
+    summary = {
+        'runs': len(timings),
+        'median_ms': statistics.median(timings) * 1000,
+        'p95_ms': timings[int(len(timings) * 0.95)] * 1000,
+        'min_ms': timings[0] * 1000,
+    }
+    if queries:
+        summary['median_queries'] = statistics.median(queries)
+    return summary
+
+
+def count_queries(result) -> Optional[int]:
+    '''Число SQL-запросов из заголовка Server-Timing ответа.'''
+    headers = getattr(result, 'headers', None)
+    if headers is None:
+        return None
+    match = QUERIES_PATTERN.search(headers.get('server-timing', ''))
+    return int(match.group(1)) if match else None
+
+
+def measure(call: Callable[[int], object], repeat: int) -> dict:
+    timings = []
+    queries = []
+    for number in range(repeat):
+        started = time.perf_counter()
+        result = call(number)
+        timings.append(time.perf_counter() - started)
+        if getattr(result, 'status_code', 200) >= 400:
+            raise RuntimeError(f'{result.status_code}: {result.text}')
+        count = count_queries(result)
+        if count is not None:
+            queries.append(count)
+    return summarize(timings, queries)
+
+
+def bench_invest(full_amounts: list[int], repeat: int) -> dict:
+    '''invest() и invest_amounts() на полной очереди без БД.'''
+    total = sum(full_amounts)
+
+    def run_invest(number):
+        sources = [
+            Donation(full_amount=amount, invested_amount=0)
+            for amount in full_amounts
+        ]
+        target = CharityProject(full_amount=total, invested_amount=0)
+        invest(target, sources)
+
+    def run_invest_amounts(number):
+        invest_amounts([total], [
+            OpenEntry(index, amount, 0)
+            for index, amount in enumerate(full_amounts)
+        ])
+
+    return {
+        'invest': measure(run_invest, repeat),
+        'invest_amounts': measure(run_invest_amounts, repeat),
+    }
+
+
+def make_client(path: Path):
+    engine = make_engine(f'sqlite+aiosqlite:///{path}')
+    session_factory = sessionmaker(
+        engine, class_=AsyncSession, expire_on_commit=False
+    )
+
+    async def get_benchmark_session():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides = {
+        get_async_session: get_benchmark_session,
+        get_read_session: get_benchmark_session,
+        current_user: lambda: benchmark_user,
+        current_superuser: lambda: benchmark_user,
+    }
+    return TestClient(app)
+
+
+def bench_endpoints(
+    directory: Path, full_amounts: list[int], distribution: str,
+    repeat: int,
+) -> dict:
+    results = {}
+    new_amounts = amounts(distribution, repeat, seed=1)
+
+    path = directory / 'projects.db'
+    seed_backlog(path, CharityProject, full_amounts)
+    client = make_client(path)
+    results['list_projects'] = measure(
+        lambda number: client.get('/charity_project/'), repeat
+    )
+    results['list_projects_open'] = measure(
+        lambda number: client.get(
+            '/charity_project/', params={'fully_invested': False}
+        ),
+        repeat,
+    )
+    results['post_donation'] = measure(
+        lambda number: client.post(
+            '/donation/', json={'full_amount': new_amounts[number]}
+        ),
+        repeat,
+    )
+
+    path = directory / 'donations.db'
+    seed_backlog(path, Donation, full_amounts)
+    client = make_client(path)
+    results['list_donations'] = measure(
+        lambda number: client.get('/donation/'), repeat
+    )
+    results['post_charity_project'] = measure(
+        lambda number: client.post('/charity_project/', json={
+            'name': f'benchmark_{number}',
+            'description': 'Benchmark',
+            'full_amount': new_amounts[number],
+        }),
+        repeat,
+    )
+    app.dependency_overrides = {}
+    return results
+
+
+def get_commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run(args) -> None:
+    results = {}
+    for distribution in args.distributions:
+        for size in args.sizes:
+            full_amounts = amounts(distribution, size)
+            suffix = f'[n={size},{distribution}]'
+            print(f'{suffix} ...', file=sys.stderr)
+            benchmarks = bench_invest(full_amounts, args.invest_repeat)
+            with tempfile.TemporaryDirectory() as directory:
+                benchmarks.update(bench_endpoints(
+                    Path(directory), full_amounts, distribution, args.repeat
+                ))
+            for name, result in benchmarks.items():
+                results[f'{name}{suffix}'] = result
+    report = {
+        'meta': {
+            'commit': get_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': datetime.now().isoformat(),
+        },
+        'results': results,
+    }
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(output)
+    print(output)
+
+
+def compare(args) -> int:
+    '''Сравнивает медианы; замедление больше threshold — регрессия.'''
+    base = json.loads(Path(args.base).read_text())['results']
+    new = json.loads(Path(args.new).read_text())['results']
+    regressions = 0
+    for name in sorted(base.keys() & new.keys()):
+        before, after = base[name]['median_ms'], new[name]['median_ms']
+        change = after / before - 1 if before else 0
+        flag = ''
+        if change > args.threshold:
+            flag = '  REGRESSION'
+            regressions += 1
+        queries = ''
+        if 'median_queries' in base[name] and 'median_queries' in new[name]:
+            queries = (
+                f'  queries {base[name]["median_queries"]:g} -> '
+                f'{new[name]["median_queries"]:g}'
+            )
+        print(
+            f'{name:<50} {before:10.3f} -> {after:10.3f} ms '
+            f'{change:+8.1%}{queries}{flag}'
+        )
+    return 1 if regressions else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run')
+    run_parser.add_argument(
+        '--sizes', type=int, nargs='+', default=DEFAULT_SIZES
+    )
+    run_parser.add_argument(
+        '--distributions', nargs='+', choices=DISTRIBUTIONS,
+        default=['uniform'],
+    )
+    run_parser.add_argument('--repeat', type=int, default=50)
+    run_parser.add_argument('--invest-repeat', type=int, default=5)
+    run_parser.add_argument('-o', '--output')
+    compare_parser = commands.add_parser('compare')
+    compare_parser.add_argument('base')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument(
+        '--threshold', type=float, default=DEFAULT_THRESHOLD
+    )
+    args = parser.parse_args()
+    if args.command == 'run':
+        run(args)
+    else:
+        sys.exit(compare(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+from conftest import IS_SQLITE, TestingSessionLocal, engine
+from sqlalchemy import event
+
+from app.constants import OPEN_SCAN_FIRST_CHUNK
+from app.crud.charity_project import charity_project_crud
+from app.models import CharityProject
+
+
+def blend_projects(mixer, *amounts):
+    return [
+        mixer.blend(
+            'app.models.charity_project.CharityProject',
+            name=f'project_{number}',
+            description='Project',
+            full_amount=full_amount,
+            invested_amount=invested_amount,
+            fully_invested=False,
+        )
+        for number, (full_amount, invested_amount) in enumerate(amounts)
+    ]
+
+
+async def test_open_prefix_returns_only_needed_rows(mixer):
+    blend_projects(mixer, (100, 90), (100, 0), (100, 0), (100, 0))
+    async with TestingSessionLocal() as session:
+        entries = await charity_project_crud.get_open_prefix(50, session)
+    assert [entry.id for entry in entries] == [1, 2], (
+        'Распределение должно читать только те открытые проекты, '
+        'которых хватает для распределения суммы.'
+    )
+    assert [entry.remains for entry in entries] == [10, 100]
+
+
+@pytest.mark.parametrize('backlog', [10, 500])
+async def test_open_prefix_reads_rows_consumed_not_backlog(mixer, backlog):
+    blend_projects(mixer, *[(100, 0)] * backlog)
+    limits = []
+
+    def collect(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            assert 'LIMIT' in statement.upper(), (
+                'Очередь должна читаться ограниченными порциями.'
+            )
+            limits.append(context.compiled_parameters[0]['param_1'])
+
+    event.listen(engine.sync_engine, 'before_cursor_execute', collect)
+    try:
+        async with TestingSessionLocal() as session:
+            entries = await charity_project_crud.get_open_prefix(
+                950, session
+            )
+    finally:
+        event.remove(engine.sync_engine, 'before_cursor_execute', collect)
+    assert [entry.id for entry in entries] == list(range(1, 11))
+    # На PostgreSQL строки блокируются, и порции начинаются с одной строки.
+    first_chunk = OPEN_SCAN_FIRST_CHUNK if IS_SQLITE else 1
+    expected = [first_chunk]
+    while sum(expected) < 10:
+        expected.append(expected[-1] * 2)
+    assert limits == expected, (
+        'Число прочитанных строк должно зависеть от распределяемой суммы, '
+        'а не от длины очереди.'
+    )
+
+
+async def test_allocate_applies_updates_in_one_pass(mixer):
+    blend_projects(mixer, (100, 90), (100, 0), (100, 0))
+    async with TestingSessionLocal() as session:
+        invested, entries = await charity_project_crud.allocate(150, session)
+        await session.commit()
+        projects = (await session.execute(
+            CharityProject.__table__.select().order_by(CharityProject.id)
+        )).all()
+    assert invested == 150
+    assert len(entries) == 3
+    assert [
+        (project.invested_amount, project.fully_invested,
+         project.close_date is not None)
+        for project in projects
+    ] == [(100, True, True), (100, True, True), (40, False, False)], (
+        'Распределение должно закрывать заполненные проекты и '
+        'частично инвестировать последний из затронутых.'
+    )
+
+
+async def test_allocate_without_open_projects(mixer):
+    async with TestingSessionLocal() as session:
+        invested, entries = await charity_project_crud.allocate(100, session)
+    assert (invested, entries) == (0, [])
+
+
+@pytest.mark.skipif(IS_SQLITE, reason='SKIP LOCKED есть только в PostgreSQL')
+async def test_concurrent_allocations_skip_locked_rows(mixer):
+    blend_projects(mixer, (100, 0), (100, 0))
+    async with TestingSessionLocal() as first, \
+            TestingSessionLocal() as second:
+        _, first_entries = await charity_project_crud.allocate(30, first)
+        _, second_entries = await charity_project_crud.allocate(30, second)
+        await first.commit()
+        await second.commit()
+    assert [entry.id for entry in first_entries] == [1]
+    assert [entry.id for entry in second_entries] == [2], (
+        'Вторая транзакция должна пропускать строки, заблокированные '
+        'первой, а не ждать их освобождения.'
+    )
+    async with TestingSessionLocal() as session:
+        projects = (await session.execute(
+            CharityProject.__table__.select().order_by(CharityProject.id)
+        )).all()
+    assert [project.invested_amount for project in projects] == [30, 30]
+
+
+@pytest.mark.skipif(not IS_SQLITE, reason='блокировка записи SQLite')
+async def test_sqlite_allocations_are_serialized(mixer):
+    blend_projects(mixer, (100, 0), (100, 0))
+    async with TestingSessionLocal() as first, \
+            TestingSessionLocal() as second:
+        await charity_project_crud.allocate(30, first)
+        task = asyncio.create_task(
+            charity_project_crud.allocate(30, second)
+        )
+        await asyncio.sleep(0.2)
+        assert not task.done(), (
+            'Второе распределение должно ждать завершения первого, '
+            'а не читать устаревшие суммы.'
+        )
+        await first.commit()
+        _, entries = await task
+        await second.commit()
+    assert [(entry.id, entry.invested_amount) for entry in entries] == [
+        (1, 60)
+    ]
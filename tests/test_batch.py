@@ -0,0 +1,107 @@
+import json
+
+import pytest
+from conftest import app, current_superuser
+from fixtures.user import superuser
+
+DONATION_URL = '/donation/'
+DONATION_BATCH_URL = '/donation/batch'
+PROJECTS_URL = '/charity_project/'
+
+
+def test_donation_batch_matches_sequential_posts(
+        user_client, charity_project, charity_project_nunchaku
+):
+    donations = [
+        {'full_amount': 600000, 'comment': 'first'},
+        {'full_amount': 600000},
+        {'full_amount': 5000000},
+    ]
+    response = user_client.post(DONATION_BATCH_URL, json=donations)
+    assert response.status_code == 200, (
+        f'Корректный POST-запрос к `{DONATION_BATCH_URL}` должен '
+        'возвращать статус-код 200.'
+    )
+    data = response.json()
+    assert [donation['id'] for donation in data] == [1, 2, 3]
+    assert {'comment', 'create_date', 'full_amount', 'id'} <= set(data[0])
+    projects = user_client.get(PROJECTS_URL).json()
+    assert [
+        (project['invested_amount'], project['fully_invested'])
+        for project in projects
+    ] == [(1000000, True), (5000000, True)], (
+        'Пакет пожертвований должен распределяться по проектам так же, '
+        'как при последовательной отправке.'
+    )
+    app.dependency_overrides[current_superuser] = lambda: superuser
+    stored = user_client.get(DONATION_URL).json()
+    assert [
+        (donation['invested_amount'], donation['fully_invested'])
+        for donation in stored
+    ] == [(600000, True), (600000, True), (4800000, False)]
+
+
+def test_donation_batch_ndjson(user_client):
+    body = '\n'.join(
+        json.dumps({'full_amount': amount}) for amount in (10, 20)
+    )
+    response = user_client.post(
+        DONATION_BATCH_URL,
+        data=body,
+        headers={'Content-Type': 'application/x-ndjson'},
+    )
+    assert response.status_code == 200
+    assert [donation['full_amount'] for donation in response.json()] == [
+        10, 20
+    ]
+
+
+@pytest.mark.parametrize('body', [
+    [],
+    [{'full_amount': 0}],
+    [{'full_amount': 100, 'invested_amount': 5}, {'comment': 'no amount'}],
+])
+def test_donation_batch_invalid(user_client, body):
+    response = user_client.post(DONATION_BATCH_URL, json=body)
+    assert response.status_code in (400, 422), (
+        'Пустой пакет или пакет с некорректными пожертвованиями '
+        'должен отклоняться.'
+    )
+
+
+PROJECTS_BATCH_URL = '/charity_project/batch'
+
+
+@pytest.mark.usefixtures('donation', 'another_donation')
+def test_projects_batch_reports_duplicates_and_invests(
+        superuser_client, charity_project
+):
+    response = superuser_client.post(PROJECTS_BATCH_URL, json=[
+        {'name': 'cats', 'description': 'Cats', 'full_amount': 150},
+        {'name': charity_project.name, 'description': 'Dup', 'full_amount': 1},
+        {'name': 'dogs', 'description': 'Dogs', 'full_amount': 5000},
+        {'name': 'cats', 'description': 'Dup', 'full_amount': 10},
+    ])
+    assert response.status_code == 200, (
+        f'Корректный POST-запрос к `{PROJECTS_BATCH_URL}` должен '
+        'возвращать статус-код 200.'
+    )
+    data = response.json()
+    assert [error['index'] for error in data['errors']] == [1, 3], (
+        'Проекты с уже занятыми названиями должны попадать в список ошибок.'
+    )
+    assert [
+        (project['name'], project['invested_amount'],
+         project['fully_invested'])
+        for project in data['created']
+    ] == [('cats', 150, True), ('dogs', 1950, False)], (
+        'Свободные пожертвования должны распределяться по новым проектам '
+        'в порядке их следования.'
+    )
+
+
+def test_projects_batch_forbidden_for_user(user_client):
+    response = user_client.post(PROJECTS_BATCH_URL, json=[
+        {'name': 'cats', 'description': 'Cats', 'full_amount': 150},
+    ])
+    assert response.status_code == 403
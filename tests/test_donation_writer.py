@@ -0,0 +1,90 @@
+import asyncio
+
+from conftest import TestingSessionLocal
+from sqlalchemy.exc import IntegrityError
+
+from app.core.metrics import metrics
+from app.crud.donation_writer import DonationWriter
+from app.models import CharityProject
+from app.models.user import User
+from app.schemas.donation import DonationBase
+
+user = User(id=2, is_active=True, is_verified=True, is_superuser=False)
+
+
+async def test_writer_groups_concurrent_donations(mixer):
+    project_id = mixer.blend(
+        'app.models.charity_project.CharityProject',
+        name='cats',
+        description='Cats',
+        full_amount=1000000,
+        invested_amount=0,
+        fully_invested=False,
+    ).id
+    writer = DonationWriter(TestingSessionLocal, max_delay=0.05, max_size=10)
+    writer.start()
+    results = await asyncio.gather(*(
+        writer.submit(DonationBase(full_amount=amount), user)
+        for amount in (600000, 300000, 200000)
+    ))
+    await writer.stop()
+    assert [result.id for result in results] == [1, 2, 3], (
+        'Каждый запрос должен получить собственный результат '
+        'в порядке поступления.'
+    )
+    stats = writer.stats()
+    assert (stats['batches'], stats['max_batch_size']) == (1, 3), (
+        'Конкурентные пожертвования должны записываться одним пакетом.'
+    )
+    async with TestingSessionLocal() as session:
+        project = await session.get(CharityProject, project_id)
+    assert (project.invested_amount, project.fully_invested) == (
+        1000000, True
+    )
+
+
+async def test_writer_respects_max_size():
+    writer = DonationWriter(TestingSessionLocal, max_delay=0.05, max_size=2)
+    writer.start()
+    await asyncio.gather(*(
+        writer.submit(DonationBase(full_amount=10), user) for _ in range(5)
+    ))
+    await writer.stop()
+    assert writer.stats()['batches'] == 3
+    assert writer.stats()['queue_depth'] == 0
+
+
+async def test_writer_fails_only_broken_donation(mixer):
+    mixer.blend(
+        'app.models.charity_project.CharityProject',
+        name='cats',
+        description='Cats',
+        full_amount=1000,
+        invested_amount=0,
+        fully_invested=False,
+    )
+    metrics.reset()
+    writer = DonationWriter(TestingSessionLocal, max_delay=0.05, max_size=10)
+    writer.start()
+    # Сумма в обход валидации схемы нарушает ограничение в БД.
+    broken = DonationBase.construct(full_amount=0)
+    results = await asyncio.gather(*(
+        writer.submit(donation, user)
+        for donation in (
+            DonationBase(full_amount=10), broken, DonationBase(full_amount=20)
+        )
+    ), return_exceptions=True)
+    await writer.stop()
+    assert isinstance(results[1], IntegrityError)
+    assert [
+        result.full_amount for result in (results[0], results[2])
+    ] == [10, 20], (
+        'Ошибка одного пожертвования не должна отменять остальные '
+        'пожертвования пакета.'
+    )
+    assert (
+        metrics.counters['invested_amount'],
+        metrics.counters['donations_allocated'],
+    ) == (30, 2), (
+        'Повторная запись частей пакета не должна завышать метрики.'
+    )
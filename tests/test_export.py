@@ -0,0 +1,41 @@
+import csv
+import io
+import json
+
+import pytest
+
+DONATION_EXPORT_URL = '/donation/export'
+PROJECTS_EXPORT_URL = '/charity_project/export'
+
+
+@pytest.mark.usefixtures('donation', 'another_donation')
+def test_export_donations_ndjson(superuser_client):
+    response = superuser_client.get(DONATION_EXPORT_URL)
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('application/x-ndjson')
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row['full_amount'] for row in rows] == [100, 2000], (
+        'Выгрузка должна содержать все пожертвования в порядке id.'
+    )
+    assert rows[0]['create_date'] == '2011-11-11T00:00:00'
+    assert set(rows[0]) == {
+        'id', 'full_amount', 'comment', 'create_date', 'user_id',
+        'invested_amount', 'fully_invested', 'close_date',
+    }
+
+
+@pytest.mark.usefixtures('charity_project')
+def test_export_projects_csv_gzip(superuser_client):
+    response = superuser_client.get(
+        PROJECTS_EXPORT_URL, params={'export_format': 'csv', 'gzip': True},
+    )
+    assert response.headers['content-encoding'] == 'gzip'
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row['name'] for row in rows] == ['chimichangas4life'], (
+        'Сжатая CSV-выгрузка должна содержать строку заголовка и проекты.'
+    )
+
+
+def test_export_forbidden_for_user(user_client):
+    for url in (DONATION_EXPORT_URL, PROJECTS_EXPORT_URL):
+        assert user_client.get(url).status_code == 403
@@ -0,0 +1,51 @@
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import parse_obj_as
+
+from app.schemas.charity_project import CharityProjectDB
+from app.schemas.donation import DonationCreate, DonationDB
+
+
+def render_with_response_model(schema, data):
+    return JSONResponse(jsonable_encoder(parse_obj_as(schema, data))).body
+
+
+@pytest.mark.usefixtures('charity_project', 'closed_charity_project_other')
+def test_projects_body_matches_response_model(user_client):
+    response = user_client.get('/charity_project/')
+    assert response.content == render_with_response_model(
+        list[CharityProjectDB], response.json()
+    ), (
+        'Тело ответа быстрого пути должно побайтно совпадать с '
+        'сериализацией через response_model.'
+    )
+
+
+@pytest.mark.usefixtures('donation', 'another_donation')
+def test_donations_body_matches_response_model(superuser_client):
+    response = superuser_client.get('/donation/')
+    assert response.content == render_with_response_model(
+        list[DonationDB], response.json()
+    )
+
+
+@pytest.mark.usefixtures('donation')
+def test_my_donations_body_matches_response_model(user_client):
+    response = user_client.get('/donation/my')
+    assert len(response.json()) == 1
+    assert response.content == render_with_response_model(
+        list[DonationCreate], response.json()
+    )
+
+
+@pytest.fixture
+def closed_charity_project_other(mixer):
+    return mixer.blend(
+        'app.models.charity_project.CharityProject',
+        name='Котики «пушистые»',
+        description='Описание с \\n переводом строки',
+        full_amount=100,
+        invested_amount=100,
+        fully_invested=True,
+    )
@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+from conftest import TestingSessionLocal
+
+from app.crud.funding_book import OpenQueue, funding_book
+from app.models import CharityProject
+
+DONATION_URL = '/donation/'
+PROJECTS_URL = '/charity_project/'
+
+
+@pytest.fixture
+def loaded_funding_book():
+    async def load():
+        async with TestingSessionLocal() as session:
+            await funding_book.load(session)
+
+    asyncio.run(load())
+    yield funding_book
+    funding_book.reset()
+
+
+def test_open_queue_pick_only_needed_entries():
+    queue = OpenQueue(CharityProject)
+    queue.put(1, 100, 90)
+    queue.put(2, 100, 0)
+    queue.put(3, 100, 0)
+    assert queue.pick(5) == [1], (
+        'Для суммы меньше остатка первого объекта очередь должна '
+        'возвращать только голову.'
+    )
+    assert queue.pick(50) == [1, 2]
+    assert queue.pick() == [1, 2, 3]
+    queue.discard(1)
+    assert queue.pick(50) == [2]
+
+
+def test_open_queue_keeps_id_order():
+    queue = OpenQueue(CharityProject)
+    queue.put(5, 10, 0)
+    queue.put(2, 10, 0)
+    queue.put(3, 10, 0)
+    queue.put(7, 10, 0)
+    assert [entry.id for entry in queue] == [2, 3, 5, 7], (
+        'Очередь открытых объектов должна быть упорядочена по id.'
+    )
+    queue.discard(3)
+    queue.discard(4)
+    assert queue.pick() == [2, 5, 7]
+    assert len(queue) == 3
+
+
+def test_funding_book_follows_investment(
+        user_client, charity_project, charity_project_nunchaku,
+        loaded_funding_book
+):
+    first_id, second_id = charity_project.id, charity_project_nunchaku.id
+    assert [entry.id for entry in loaded_funding_book.projects] == [
+        first_id, second_id
+    ]
+    user_client.post(DONATION_URL, json={'full_amount': 1000000})
+    user_client.post(DONATION_URL, json={'full_amount': 100})
+    projects = user_client.get(PROJECTS_URL).json()
+    assert [
+        (project['fully_invested'], project['invested_amount'])
+        for project in projects
+    ] == [(True, 1000000), (False, 100)], (
+        'При загруженной книге пожертвования должны распределяться '
+        'по открытым проектам в порядке их создания.'
+    )
+    assert [
+        (entry.id, entry.invested_amount)
+        for entry in loaded_funding_book.projects
+    ] == [(second_id, 100)], (
+        'Закрытый проект должен удаляться из книги, а суммы открытых - '
+        'обновляться.'
+    )
+
+
+def test_funding_book_falls_back_to_database(
+        user_client, mixer, loaded_funding_book
+):
+    # Проект создан в обход процесса: другим воркером или вручную.
+    project = mixer.blend(
+        'app.models.charity_project.CharityProject',
+        name='external', description='Project',
+        full_amount=100, invested_amount=0, fully_invested=False,
+    )
+    assert not len(loaded_funding_book.projects)
+    user_client.post(DONATION_URL, json={'full_amount': 40})
+    projects = user_client.get(PROJECTS_URL).json()
+    assert projects[0]['invested_amount'] == 40, (
+        'Если строк из книги не хватает на сумму, открытые объекты '
+        'должны читаться из БД.'
+    )
+    assert [
+        (entry.id, entry.invested_amount)
+        for entry in loaded_funding_book.projects
+    ] == [(project.id, 40)], (
+        'Найденный в БД проект должен попадать в книгу.'
+    )
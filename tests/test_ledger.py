@@ -0,0 +1,121 @@
+from conftest import app, current_superuser, current_user
+from fixtures.user import superuser
+
+from app.models.user import User
+
+PROJECTS_URL = '/charity_project/'
+DONATION_URL = '/donation/'
+
+
+def create_projects(client, *amounts):
+    app.dependency_overrides[current_superuser] = lambda: superuser
+    for number, full_amount in enumerate(amounts):
+        response = client.post(PROJECTS_URL, json={
+            'name': f'project_{number}',
+            'description': 'Project',
+            'full_amount': full_amount,
+        })
+        assert response.status_code == 200, response.json()
+
+
+def test_donation_allocations(user_client):
+    create_projects(user_client, 100, 50)
+    donation = user_client.post(DONATION_URL, json={'full_amount': 120})
+    donation_id = donation.json()['id']
+    response = user_client.get(f'{DONATION_URL}{donation_id}/allocations')
+    assert response.status_code == 200
+    assert [
+        (allocation['project_id'], allocation['amount'])
+        for allocation in response.json()
+    ] == [(1, 100), (2, 20)], (
+        'Журнал должен хранить, какие проекты и на какую сумму '
+        'получили средства пожертвования.'
+    )
+    assert set(response.json()[0]) == {
+        'id', 'amount', 'created_at', 'project_id'
+    }
+
+
+def test_project_funders_pagination(user_client):
+    create_projects(user_client, 50)
+    user_client.post(DONATION_URL, json={'full_amount': 20})
+    user_client.post(DONATION_URL, json={'full_amount': 40})
+    response = user_client.get(
+        f'{PROJECTS_URL}1/funders', params={'limit': 1}
+    )
+    assert [
+        (funder['donation_id'], funder['amount'])
+        for funder in response.json()
+    ] == [(1, 20)]
+    after = response.headers['X-Next-Cursor']
+    response = user_client.get(
+        f'{PROJECTS_URL}1/funders', params={'limit': 1, 'after': after}
+    )
+    assert [
+        (funder['donation_id'], funder['amount'])
+        for funder in response.json()
+    ] == [(2, 30)], (
+        'Следующая страница спонсоров должна начинаться после курсора.'
+    )
+    assert 'X-Next-Cursor' not in response.headers
+
+
+def test_project_allocates_donations_to_ledger(user_client):
+    user_client.post(DONATION_URL, json={'full_amount': 30})
+    user_client.post(DONATION_URL, json={'full_amount': 30})
+    create_projects(user_client, 45)
+    response = user_client.get(f'{PROJECTS_URL}1/funders')
+    assert [
+        (funder['donation_id'], funder['amount'])
+        for funder in response.json()
+    ] == [(1, 30), (2, 15)], (
+        'Новый проект должен записывать в журнал вложения '
+        'свободных пожертвований.'
+    )
+
+
+def test_drifted_project_closed_without_transfer(user_client, mixer):
+    # Проект, у которого после ручной правки вложено всё,
+    # но он остался открытым.
+    mixer.blend(
+        'app.models.charity_project.CharityProject',
+        name='drifted', description='Project',
+        full_amount=50, invested_amount=50, fully_invested=False,
+    )
+    create_projects(user_client, 100)
+    donation = user_client.post(DONATION_URL, json={'full_amount': 30})
+    assert donation.status_code == 200, donation.json()
+    response = user_client.get(
+        f'{DONATION_URL}{donation.json()["id"]}/allocations'
+    )
+    assert [
+        (allocation['project_id'], allocation['amount'])
+        for allocation in response.json()
+    ] == [(2, 30)], (
+        'Источник с нулевым остатком не должен попадать в журнал.'
+    )
+    projects = user_client.get(PROJECTS_URL).json()
+    assert projects[0]['fully_invested'], (
+        'Открытый проект с нулевым остатком должен закрываться.'
+    )
+
+
+def test_foreign_donation_allocations_forbidden(user_client):
+    donation = user_client.post(DONATION_URL, json={'full_amount': 10})
+    assert donation.status_code == 200
+    app.dependency_overrides[current_user] = lambda: User(
+        id=5, is_active=True, is_verified=True, is_superuser=False
+    )
+    response = user_client.get(
+        f'{DONATION_URL}{donation.json()["id"]}/allocations'
+    )
+    assert response.status_code == 403, (
+        'Чужие пожертвования должны быть недоступны пользователю.'
+    )
+    response = user_client.get(f'{DONATION_URL}100/allocations')
+    assert response.status_code == 404
+
+
+def test_funders_only_for_superuser(user_client):
+    response = user_client.get(f'{PROJECTS_URL}1/funders')
+    assert response.status_code == 403
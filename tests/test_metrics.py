@@ -0,0 +1,92 @@
+import re
+
+import pytest
+from conftest import TestingSessionLocal
+
+from app.core.config import settings
+from app.core.db import record_after_commit
+from app.core.metrics import metrics
+
+DONATION_URL = '/donation/'
+METRICS_URL = '/metrics'
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def get_metric(text, name, labels=''):
+    match = re.search(
+        rf'^{re.escape(name + labels)} (\S+)$', text, re.MULTILINE
+    )
+    return float(match.group(1)) if match else None
+
+
+def test_metrics_by_route_template(user_client, charity_project):
+    user_client.get(f'/charity_project/{charity_project.id}')
+    user_client.get('/charity_project/100500')
+    response = user_client.get(METRICS_URL)
+    assert response.status_code == 200
+    text = response.text
+    route = 'route="/charity_project/{project_id}"'
+    assert get_metric(
+        text, 'qrkot_http_request_duration_seconds_count',
+        f'{{method="GET",{route}}}',
+    ) == 2, (
+        'Метрики должны агрегироваться по шаблону маршрута, '
+        'а не по конкретному пути.'
+    )
+    assert get_metric(
+        text, 'qrkot_http_requests_total',
+        f'{{method="GET",{route},status="405"}}',
+    ) == 2
+    assert get_metric(text, 'qrkot_http_requests_in_flight') == 1
+
+
+def test_metrics_count_investment(
+        user_client, charity_project, charity_project_nunchaku
+):
+    user_client.post(DONATION_URL, json={'full_amount': 1000100})
+    text = user_client.get(METRICS_URL).text
+    assert get_metric(text, 'qrkot_invested_amount_total') == 1000100, (
+        'Метрики должны учитывать вложенную сумму.'
+    )
+    assert get_metric(text, 'qrkot_projects_closed_total') == 1
+    assert get_metric(text, 'qrkot_donations_allocated_total') == 1
+    assert get_metric(text, 'qrkot_donations_closed_total') == 1
+
+
+async def test_metrics_counted_only_after_commit():
+    async with TestingSessionLocal() as session:
+        await session.connection()
+        record_after_commit(session, {'invested_amount': 100})
+        await session.rollback()
+        assert metrics.counters['invested_amount'] == 0, (
+            'Счётчики отменённой транзакции не должны учитываться.'
+        )
+        await session.connection()
+        record_after_commit(session, {'invested_amount': 30})
+        record_after_commit(session, {'invested_amount': 20})
+        assert metrics.counters['invested_amount'] == 0
+        await session.commit()
+    assert metrics.counters['invested_amount'] == 50, (
+        'Счётчики должны учитываться после commit.'
+    )
+
+
+def test_metrics_require_token(user_client, monkeypatch):
+    monkeypatch.setattr(settings, 'metrics_token', 'scrape-token')
+    assert user_client.get(METRICS_URL).status_code == 401, (
+        'С METRICS_TOKEN метрики без токена должны быть недоступны.'
+    )
+    assert user_client.get(
+        METRICS_URL, headers={'Authorization': 'Bearer wrong'}
+    ).status_code == 401
+    response = user_client.get(
+        METRICS_URL, headers={'Authorization': 'Bearer scrape-token'}
+    )
+    assert response.status_code == 200
+    assert 'qrkot_http_requests_in_flight' in response.text
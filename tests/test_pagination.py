@@ -0,0 +1,70 @@
+from datetime import datetime
+
+import pytest
+
+PROJECTS_URL = '/charity_project/'
+DONATION_URL = '/donation/'
+
+
+@pytest.fixture
+def five_projects(mixer):
+    return [
+        mixer.blend(
+            'app.models.charity_project.CharityProject',
+            name=f'project_{number}',
+            description='Project',
+            full_amount=100,
+            invested_amount=100 if number % 2 else 0,
+            fully_invested=bool(number % 2),
+            create_date=datetime(2020, 1, number + 1),
+        )
+        for number in range(5)
+    ]
+
+
+@pytest.mark.usefixtures('five_projects')
+def test_projects_keyset_pagination(user_client):
+    response = user_client.get(PROJECTS_URL, params={'limit': 2})
+    assert [project['id'] for project in response.json()] == [1, 2]
+    assert response.headers['X-Next-Cursor'] == '2', (
+        'Если есть следующая страница, в заголовке X-Next-Cursor '
+        'должен возвращаться id последнего объекта.'
+    )
+    ids = []
+    after = None
+    while True:
+        params = {'limit': 2}
+        if after is not None:
+            params['after'] = after
+        response = user_client.get(PROJECTS_URL, params=params)
+        ids += [project['id'] for project in response.json()]
+        after = response.headers.get('X-Next-Cursor')
+        if after is None:
+            break
+    assert ids == [1, 2, 3, 4, 5], (
+        'Обход страниц по курсору должен вернуть все проекты ровно один раз.'
+    )
+
+
+@pytest.mark.usefixtures('five_projects')
+def test_projects_filters(user_client):
+    response = user_client.get(PROJECTS_URL, params={'fully_invested': True})
+    assert [project['id'] for project in response.json()] == [2, 4]
+    response = user_client.get(PROJECTS_URL, params={
+        'created_from': '2020-01-02T00:00:00',
+        'created_to': '2020-01-04T00:00:00',
+    })
+    assert [project['id'] for project in response.json()] == [2, 3]
+
+
+@pytest.mark.usefixtures('five_projects')
+def test_projects_all_without_pages(user_client):
+    response = user_client.get(PROJECTS_URL, params={'all': True, 'limit': 1})
+    assert len(response.json()) == 5
+    assert 'X-Next-Cursor' not in response.headers
+
+
+@pytest.mark.usefixtures('donation', 'another_donation')
+def test_donations_user_filter(superuser_client):
+    response = superuser_client.get(DONATION_URL, params={'user_id': 1})
+    assert [donation['user_id'] for donation in response.json()] == [1]
@@ -0,0 +1,45 @@
+import pytest
+
+from app.core.password import PasswordPool
+from app.core.user import password_pool
+
+LOGIN_URL = '/auth/jwt/login'
+REGISTER_URL = '/auth/register'
+USER_DATA = {'email': 'dead@pool.com', 'password': 'chimichangas4life'}
+
+
+async def test_password_pool_hash_and_verify():
+    pool = PasswordPool(workers=1, max_pending=1)
+    hashed = await pool.hash('chimichangas4life')
+    assert (await pool.verify_and_update('chimichangas4life', hashed))[0]
+    assert not (await pool.verify_and_update('nunchaku', hashed))[0]
+    pool.shutdown()
+
+
+def test_login_rejected_when_pool_is_full(test_client, monkeypatch):
+    assert test_client.post(REGISTER_URL, json=USER_DATA).status_code == 201
+    monkeypatch.setattr(password_pool, 'max_pending', 0)
+    response = test_client.post(LOGIN_URL, data={
+        'username': USER_DATA['email'], 'password': USER_DATA['password']
+    })
+    assert response.status_code == 503, (
+        'При переполненной очереди хеширования вход должен отклоняться '
+        'со статусом 503.'
+    )
+    assert (
+        f'qrkot_password_pool{{stat="rejected"}} {password_pool.rejected}'
+    ) in test_client.get('/metrics').text, (
+        'Число отклонённых запросов к пулу должно отдаваться в /metrics.'
+    )
+
+
+@pytest.mark.parametrize('password, status_code', [
+    ('chimichangas4life', 200),
+    ('nunchaku', 400),
+])
+def test_login_through_pool(test_client, password, status_code):
+    test_client.post(REGISTER_URL, json=USER_DATA)
+    response = test_client.post(LOGIN_URL, data={
+        'username': USER_DATA['email'], 'password': password
+    })
+    assert response.status_code == status_code
@@ -0,0 +1,100 @@
+import pytest
+from conftest import app, get_async_session, override_db
+from fastapi.testclient import TestClient
+
+from app.api.routers import main_router
+from app.core import profiling
+from app.core.config import settings
+from app.core.password import hash_password
+from app.core.user import token_cache, user_cache
+
+PROJECTS_URL = '/charity_project/'
+
+
+def login(mixer, email, is_superuser):
+    mixer.blend(
+        'app.models.user.User',
+        email=email,
+        hashed_password=hash_password('chimichangas4life'),
+        is_active=True,
+        is_verified=True,
+        is_superuser=is_superuser,
+    )
+    app.dependency_overrides = {get_async_session: override_db}
+    token_cache.clear()
+    user_cache.clear()
+    client = TestClient(app)
+    token = client.post('/auth/jwt/login', data={
+        'username': email, 'password': 'chimichangas4life'
+    }).json()['access_token']
+    client.headers['Authorization'] = f'Bearer {token}'
+    return client
+
+
+def test_superuser_gets_profile_report(mixer, monkeypatch):
+    monkeypatch.setattr(settings, 'profile_limit', 1000)
+    client = login(mixer, 'admin@qrkot.com', is_superuser=True)
+    response = client.get(PROJECTS_URL, headers={'X-Profile': '1'})
+    assert response.status_code == 200
+    assert response.headers['x-profile-status'] == '200', (
+        'Отчёт профилировщика должен сообщать статус исходного ответа.'
+    )
+    assert 'get_all_charity_projects' in response.text, (
+        'Отчёт должен содержать функции эндпоинта.'
+    )
+    assert 'cumulative' in response.text
+
+
+def test_profile_saved_to_dir(mixer, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'profile_dir', str(tmp_path))
+    client = login(mixer, 'admin@qrkot.com', is_superuser=True)
+    response = client.get(f'{PROJECTS_URL}?profile=1')
+    assert response.json() == []
+    saved = list(tmp_path.glob('*.prof'))
+    assert [str(path) for path in saved] == [
+        response.headers['x-profile-file']
+    ], 'При заданном profile_dir профиль должен сохраняться в .prof.'
+
+
+@pytest.mark.parametrize('is_superuser', [False, None])
+def test_profile_hidden_from_others(mixer, is_superuser):
+    if is_superuser is None:
+        app.dependency_overrides = {get_async_session: override_db}
+        client = TestClient(app)
+    else:
+        client = login(mixer, 'user@qrkot.com', is_superuser=False)
+    response = client.get(PROJECTS_URL, headers={'X-Profile': '1'})
+    assert response.json() == [], (
+        'Профиль запроса доступен только суперпользователю.'
+    )
+    assert 'x-profile-status' not in response.headers
+
+
+@pytest.mark.parametrize('is_superuser', [False, None])
+def test_profiler_not_started_for_others(mixer, monkeypatch, is_superuser):
+    started = []
+
+    class Profile(profiling.cProfile.Profile):
+        def __init__(self):
+            super().__init__()
+            started.append(self)
+
+    monkeypatch.setattr(profiling.cProfile, 'Profile', Profile)
+    if is_superuser is None:
+        app.dependency_overrides = {get_async_session: override_db}
+        client = TestClient(app)
+    else:
+        client = login(mixer, 'user@qrkot.com', is_superuser=False)
+    response = client.get(f'{PROJECTS_URL}?profile=1')
+    assert response.status_code == 200
+    assert not started, (
+        'Профилировщик должен запускаться только после проверки, '
+        'что запрос сделан суперпользователем.'
+    )
+
+
+def test_routes_do_not_check_profiling_access():
+    assert not main_router.dependencies, (
+        'Запросы без флага профилирования не должны разрешать '
+        'зависимости аутентификации.'
+    )
@@ -0,0 +1,97 @@
+import re
+
+import pytest
+from test_query_stats import instrumented_engine  # noqa
+
+PROJECT_DETAILS_URL = '/charity_project/{project_id}'
+
+
+def count_queries(response) -> int:
+    return int(re.search(
+        r'desc="(\d+) queries"', response.headers['server-timing']
+    ).group(1))
+
+
+@pytest.mark.usefixtures('instrumented_engine')
+def test_patch_is_single_guarded_update(superuser_client, charity_project):
+    response = superuser_client.patch(
+        PROJECT_DETAILS_URL.format(project_id=charity_project.id),
+        json={'description': 'New description'},
+    )
+    assert response.status_code == 200, response.json()
+    assert response.json()['description'] == 'New description'
+    assert count_queries(response) <= 2, (
+        'PATCH без изменения суммы должен выполняться условным UPDATE '
+        'без предварительного чтения проекта.'
+    )
+
+
+def test_patch_keeps_own_name(superuser_client, charity_project):
+    response = superuser_client.patch(
+        PROJECT_DETAILS_URL.format(project_id=charity_project.id),
+        json={'name': charity_project.name},
+    )
+    assert response.status_code == 200, (
+        'Проекту можно оставить его же название.'
+    )
+
+
+@pytest.mark.usefixtures('charity_project_nunchaku')
+def test_patch_duplicate_name_rolls_back(superuser_client, charity_project):
+    url = PROJECT_DETAILS_URL.format(project_id=charity_project.id)
+    response = superuser_client.patch(
+        url, json={'name': 'nunchaku', 'description': 'Changed'}
+    )
+    assert response.status_code == 400
+    response = superuser_client.patch(url, json={'full_amount': 500})
+    assert response.json()['description'] == charity_project.description, (
+        'При конфликте названий проект не должен меняться.'
+    )
+
+
+@pytest.mark.parametrize('method', ['patch', 'delete'])
+def test_mutations_of_missing_project(superuser_client, method):
+    kwargs = {'json': {'full_amount': 10}} if method == 'patch' else {}
+    response = getattr(superuser_client, method)(
+        PROJECT_DETAILS_URL.format(project_id=100), **kwargs
+    )
+    assert response.status_code == 404, (
+        'Для несуществующего проекта ошибка должна определяться '
+        'после неудачного условного запроса.'
+    )
+
+
+def test_delete_returns_removed_project(superuser_client, charity_project):
+    response = superuser_client.delete(
+        PROJECT_DETAILS_URL.format(project_id=charity_project.id)
+    )
+    assert response.status_code == 200
+    assert response.json()['name'] == charity_project.name
+    response = superuser_client.delete(
+        PROJECT_DETAILS_URL.format(project_id=charity_project.id)
+    )
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize('json', [{}, {'description': None}])
+def test_patch_without_changes(superuser_client, charity_project, json):
+    response = superuser_client.patch(
+        PROJECT_DETAILS_URL.format(project_id=charity_project.id), json=json
+    )
+    assert response.status_code == 200, (
+        'PATCH без изменяемых полей должен возвращать проект без изменений.'
+    )
+    assert response.json()['description'] == charity_project.description
+
+
+@pytest.mark.parametrize('json', [{}, {'description': None}])
+def test_patch_without_changes_of_closed_project(
+    superuser_client, small_fully_charity_project, json
+):
+    response = superuser_client.patch(
+        PROJECT_DETAILS_URL.format(project_id=small_fully_charity_project.id),
+        json=json,
+    )
+    assert response.status_code == 400, (
+        'Закрытый проект нельзя редактировать даже пустым PATCH.'
+    )
@@ -0,0 +1,81 @@
+import logging
+import re
+
+import pytest
+from conftest import engine
+from sqlalchemy import event, text
+from sqlalchemy.exc import DBAPIError
+
+from app.core.config import settings
+from app.core.query_stats import (
+    after_cursor_execute, before_cursor_execute, instrument_engine
+)
+
+PROJECTS_URL = '/charity_project/'
+
+
+@pytest.fixture
+def instrumented_engine():
+    instrument_engine(engine)
+    yield engine
+    for name, listener in (
+        ('before_cursor_execute', before_cursor_execute),
+        ('after_cursor_execute', after_cursor_execute),
+    ):
+        event.remove(engine.sync_engine, name, listener)
+
+
+@pytest.mark.usefixtures('instrumented_engine')
+def test_server_timing_counts_queries(user_client, charity_project):
+    response = user_client.get(PROJECTS_URL)
+    server_timing = response.headers.get('server-timing', '')
+    match = re.search(r'db;dur=[\d.]+;desc="(\d+) queries"', server_timing)
+    assert match, (
+        'Ответ должен содержать заголовок Server-Timing со временем '
+        'и количеством SQL-запросов.'
+    )
+    assert int(match.group(1)) == 1
+    assert 'app;dur=' in server_timing
+
+
+@pytest.mark.usefixtures('instrumented_engine')
+def test_slow_query_logged_with_plan(
+        user_client, charity_project, monkeypatch, caplog
+):
+    monkeypatch.setattr(settings, 'slow_query_ms', 0)
+    with caplog.at_level(logging.WARNING, logger='app.core.query_stats'):
+        user_client.get(PROJECTS_URL)
+    assert any(
+        'Медленный запрос' in message and 'SCAN' in message.upper()
+        for message in (record.message for record in caplog.records)
+    ), 'Медленные запросы должны логироваться вместе с EXPLAIN QUERY PLAN.'
+
+
+def test_create_does_not_reload_after_commit(user_client, charity_project):
+    statements = []
+
+    def collect(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.lstrip().split()[0].upper())
+
+    event.listen(engine.sync_engine, 'before_cursor_execute', collect)
+    try:
+        response = user_client.post('/donation/', json={'full_amount': 10})
+    finally:
+        event.remove(engine.sync_engine, 'before_cursor_execute', collect)
+    assert response.status_code == 200
+    assert response.json()['create_date']
+    assert statements[-1] != 'SELECT', (
+        'После записи пожертвования ответ должен строиться '
+        'без повторного чтения объекта из БД.'
+    )
+
+
+@pytest.mark.usefixtures('instrumented_engine')
+async def test_failed_statement_leaves_no_timing_state():
+    async with engine.connect() as connection:
+        with pytest.raises(DBAPIError):
+            await connection.execute(text('SELECT * FROM missing_table'))
+        assert 'query_started' not in connection.info, (
+            'Время старта упавшего запроса не должно копиться '
+            'на соединении.'
+        )
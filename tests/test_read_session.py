@@ -0,0 +1,40 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.core.config import settings
+from app.core.db import (
+    get_async_session, get_pool_stats, get_read_session, make_engine,
+    make_read_engine
+)
+
+
+def test_read_session_defaults_to_primary():
+    assert get_read_session is get_async_session, (
+        'Без настроенной реплики чтения должны использовать основной движок.'
+    )
+    assert set(get_pool_stats()) == {'primary', 'read'}
+
+
+async def test_sqlite_read_only_engine(tmp_path, monkeypatch):
+    url = f'sqlite+aiosqlite:///{tmp_path / "split.db"}'
+    monkeypatch.setattr(settings, 'database_url', url)
+    monkeypatch.setattr(settings, 'sqlite_read_only', True)
+    primary = make_engine(url)
+    read_engine = make_read_engine(primary)
+    try:
+        async with primary.begin() as connection:
+            await connection.execute(text('CREATE TABLE item (id INTEGER)'))
+            await connection.execute(text('INSERT INTO item VALUES (1)'))
+        async with read_engine.connect() as connection:
+            assert (await connection.execute(
+                text('SELECT count(*) FROM item')
+            )).scalar() == 1, (
+                'Движок для чтений должен видеть данные основного движка.'
+            )
+            with pytest.raises(OperationalError):
+                await connection.execute(text('INSERT INTO item VALUES (2)'))
+    finally:
+        await read_engine.dispose()
+        await primary.dispose()
+    assert read_engine is not primary
@@ -0,0 +1,134 @@
+import random
+from datetime import datetime, timedelta
+
+import numpy as np
+from conftest import app, current_superuser, TestingSessionLocal
+from fixtures.user import superuser
+from sqlalchemy import select, update
+
+from app.crud.invest import invest
+from app.models import CharityProject, Donation, Investment
+from app.reconcile import (
+    Snapshot, allocate_history, rebuild_ledger, write_fixes
+)
+
+
+def replay_history(events):
+    '''Поочерёдное распределение через invest(), как в эндпоинтах.'''
+    objects = {CharityProject: [], Donation: []}
+    for model, full_amount in events:
+        target = model(full_amount=full_amount, invested_amount=0)
+        target.fully_invested = False
+        other = Donation if model is CharityProject else CharityProject
+        invest(target, [
+            source for source in objects[other] if not source.fully_invested
+        ])
+        objects[model].append(target)
+    return objects
+
+
+def make_snapshot(model, objects, started):
+    return Snapshot(model, [
+        (
+            number, obj.full_amount, obj.invested_amount,
+            obj.fully_invested, started + timedelta(minutes=number),
+        )
+        for number, obj in enumerate(objects, start=1)
+    ])
+
+
+def test_vectorized_allocation_matches_invest():
+    rng = random.Random(0)
+    events = [
+        (rng.choice((CharityProject, Donation)), rng.randint(1, 500))
+        for _ in range(300)
+    ]
+    objects = replay_history(events)
+    started = datetime(2020, 1, 1)
+    projects = make_snapshot(
+        CharityProject, objects[CharityProject], started
+    )
+    donations = make_snapshot(Donation, objects[Donation], started)
+    for allocation in allocate_history(projects, donations):
+        snapshot = allocation.snapshot
+        assert np.array_equal(
+            allocation.invested_amounts, snapshot.invested_amounts
+        ), (
+            'Расчёт по накопленным суммам должен совпадать '
+            'с поочерёдным invest().'
+        )
+        assert np.array_equal(allocation.closed, snapshot.closed)
+        assert not len(allocation.discrepancies())
+
+
+def test_allocation_without_counterpart():
+    projects = Snapshot(CharityProject, [(1, 100, 0, False, None)])
+    donations = Snapshot(Donation, [])
+    project_allocation, donation_allocation = allocate_history(
+        projects, donations
+    )
+    assert project_allocation.invested_amounts.tolist() == [0]
+    assert not len(project_allocation.discrepancies())
+    assert not len(donation_allocation.invested_amounts)
+
+
+async def load_snapshots(session):
+    return (
+        await Snapshot.load(CharityProject, session),
+        await Snapshot.load(Donation, session),
+    )
+
+
+async def test_fix_and_rebuild_ledger(user_client):
+    app.dependency_overrides[current_superuser] = lambda: superuser
+    for number, full_amount in enumerate((100, 50)):
+        user_client.post('/charity_project/', json={
+            'name': f'project_{number}',
+            'description': 'Project',
+            'full_amount': full_amount,
+        })
+    for full_amount in (70, 60, 40):
+        user_client.post('/donation/', json={'full_amount': full_amount})
+    async with TestingSessionLocal() as session:
+        ledger = (await session.execute(
+            select(
+                Investment.project_id, Investment.donation_id,
+                Investment.amount,
+            ).order_by(Investment.id)
+        )).all()
+        await session.execute(
+            update(CharityProject).where(CharityProject.id == 2).values(
+                invested_amount=10, fully_invested=False, close_date=None
+            )
+        )
+        await session.commit()
+        projects, donations = await load_snapshots(session)
+        project_allocation, donation_allocation = allocate_history(
+            projects, donations
+        )
+        positions = project_allocation.discrepancies()
+        assert projects.ids[positions].tolist() == [2], (
+            'Сверка должна находить проект с испорченной суммой.'
+        )
+        assert not len(donation_allocation.discrepancies())
+        await write_fixes(project_allocation, positions, session)
+        transfers = await rebuild_ledger(projects, donations, session)
+        await session.commit()
+        project = await session.get(CharityProject, 2)
+        rebuilt = (await session.execute(
+            select(
+                Investment.project_id, Investment.donation_id,
+                Investment.amount,
+            ).order_by(Investment.id)
+        )).all()
+    assert (
+        project.invested_amount, project.fully_invested,
+        project.close_date is not None,
+    ) == (50, True, True), (
+        'С --fix сверка должна записывать расчётные суммы и статус.'
+    )
+    assert transfers == len(ledger)
+    assert rebuilt == ledger, (
+        'Журнал, восстановленный по расчёту, должен совпадать '
+        'с журналом, записанным при распределении.'
+    )
@@ -0,0 +1,111 @@
+import pytest
+from conftest import app, current_superuser, engine
+from fixtures.user import superuser
+from sqlalchemy import event
+
+PROJECTS_URL = '/charity_project/'
+DONATION_URL = '/donation/'
+
+
+@pytest.fixture
+def open_project_and_donations(mixer):
+    # Открытые пожертвования рядом с открытым проектом остаются
+    # после SKIP LOCKED на PostgreSQL или ручной правки сумм.
+    project = mixer.blend(
+        'app.models.charity_project.CharityProject',
+        name='project', description='Project',
+        full_amount=60, invested_amount=50, fully_invested=False,
+    )
+    for full_amount in (30, 40, 50):
+        mixer.blend(
+            'app.models.donation.Donation',
+            user_id=2, full_amount=full_amount, invested_amount=0,
+            fully_invested=False, comment=None,
+        )
+    return project
+
+
+def test_patch_reinvests_into_new_capacity(
+    user_client, open_project_and_donations
+):
+    app.dependency_overrides[current_superuser] = lambda: superuser
+    response = user_client.patch(
+        f'{PROJECTS_URL}{open_project_and_donations.id}',
+        json={'full_amount': 110},
+    )
+    assert response.status_code == 200, response.json()
+    assert (
+        response.json()['invested_amount'], response.json()['fully_invested']
+    ) == (110, True), (
+        'После увеличения full_amount свободные пожертвования должны '
+        'сразу распределяться в проект.'
+    )
+    donations = user_client.get(DONATION_URL, params={'all': True}).json()
+    assert [
+        (donation['invested_amount'], donation['fully_invested'])
+        for donation in donations
+    ] == [(30, True), (30, False), (0, False)], (
+        'Распределение должно затрагивать только нужные пожертвования '
+        'из головы очереди.'
+    )
+    funders = user_client.get(
+        f'{PROJECTS_URL}{open_project_and_donations.id}/funders'
+    )
+    assert [
+        (funder['donation_id'], funder['amount'])
+        for funder in funders.json()
+    ] == [(1, 30), (2, 30)], (
+        'Довложение должно попадать в журнал распределения.'
+    )
+
+
+def test_patch_without_raise_keeps_donations(
+    user_client, open_project_and_donations
+):
+    app.dependency_overrides[current_superuser] = lambda: superuser
+    response = user_client.patch(
+        f'{PROJECTS_URL}{open_project_and_donations.id}',
+        json={'description': 'New description'},
+    )
+    assert response.status_code == 200, response.json()
+    assert response.json()['invested_amount'] == 50
+    donations = user_client.get(DONATION_URL, params={'all': True}).json()
+    assert all(not donation['invested_amount'] for donation in donations)
+
+
+def test_patch_reads_only_consumed_donations(user_client, mixer):
+    project = mixer.blend(
+        'app.models.charity_project.CharityProject',
+        name='project', description='Project',
+        full_amount=60, invested_amount=50, fully_invested=False,
+    )
+    for _ in range(300):
+        mixer.blend(
+            'app.models.donation.Donation',
+            user_id=2, full_amount=10, invested_amount=0,
+            fully_invested=False, comment=None,
+        )
+    limits = []
+
+    def collect(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT') and (
+            'FROM donation' in statement
+        ):
+            limits.append(context.compiled_parameters[0].get('param_1'))
+
+    app.dependency_overrides[current_superuser] = lambda: superuser
+    event.listen(engine.sync_engine, 'before_cursor_execute', collect)
+    try:
+        response = user_client.patch(
+            f'{PROJECTS_URL}{project.id}', json={'full_amount': 80}
+        )
+    finally:
+        event.remove(engine.sync_engine, 'before_cursor_execute', collect)
+    assert response.json()['invested_amount'] == 80
+    assert limits and all(limit is not None for limit in limits), (
+        'Довложение должно читать очередь пожертвований порциями.'
+    )
+    assert sum(limits) < 20, (
+        'Число прочитанных пожертвований должно зависеть от довложенной '
+        'суммы, а не от длины очереди.'
+    )
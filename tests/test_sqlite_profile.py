@@ -0,0 +1,39 @@
+from sqlalchemy import text
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
+
+from app.core.config import settings
+from app.core.db import make_engine
+
+
+async def read_pragmas(engine, *names):
+    async with engine.connect() as connection:
+        return [
+            (await connection.execute(text(f'PRAGMA {name}'))).scalar()
+            for name in names
+        ]
+
+
+async def test_sqlite_tuning_applies_pragmas(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'sqlite_tuning', True)
+    engine = make_engine(f'sqlite+aiosqlite:///{tmp_path / "tuned.db"}')
+    try:
+        pragmas = await read_pragmas(
+            engine, 'journal_mode', 'synchronous', 'busy_timeout',
+            'temp_store', 'cache_size',
+        )
+    finally:
+        await engine.dispose()
+    assert pragmas == ['wal', 1, 5000, 2, -65536], (
+        'Профиль SQLite должен применять прагмы к каждому соединению пула.'
+    )
+    assert isinstance(engine.pool, AsyncAdaptedQueuePool)
+
+
+async def test_sqlite_defaults_without_tuning(tmp_path):
+    engine = make_engine(f'sqlite+aiosqlite:///{tmp_path / "plain.db"}')
+    try:
+        journal_mode, = await read_pragmas(engine, 'journal_mode')
+    finally:
+        await engine.dispose()
+    assert journal_mode == 'delete'
+    assert isinstance(engine.pool, NullPool)
@@ -0,0 +1,100 @@
+import pytest
+from conftest import app, current_superuser
+from fastapi.routing import APIRoute
+from fixtures.user import superuser
+from test_query_stats import instrumented_engine  # noqa
+
+from app.core.config import settings
+from app.core.tracing import trace_routes, traces
+
+DONATION_URL = '/donation/'
+TRACES_URL = '/traces/'
+
+
+def walk_dependants(dependant):
+    yield dependant
+    for sub_dependant in dependant.dependencies:
+        yield from walk_dependants(sub_dependant)
+
+
+@pytest.fixture(scope='module', autouse=True)
+def traced_app():
+    # Трассировка по умолчанию выключена: включаем её на время модуля
+    # и возвращаем маршрутам исходные обработчики и зависимости.
+    if settings.tracing:
+        yield
+        return
+    routes = [route for route in app.routes if isinstance(route, APIRoute)]
+    saved = [
+        (route, route.app, route.dependency_overrides_provider)
+        for route in routes
+    ]
+    calls = [
+        (dependant, dependant.call)
+        for route in routes
+        for dependant in walk_dependants(route.dependant)
+    ]
+    trace_routes(app)
+    yield
+    for route, route_app, provider in saved:
+        route.app = route_app
+        route.dependency_overrides_provider = provider
+    for dependant, call in calls:
+        dependant.call = call
+
+
+@pytest.fixture
+def sample_all(monkeypatch):
+    monkeypatch.setattr(settings, 'trace_sample_rate', 1.0)
+    traces.clear()
+    yield
+    traces.clear()
+
+
+@pytest.mark.usefixtures('sample_all', 'instrumented_engine')
+def test_trace_records_dependencies_and_phases(
+        user_client, charity_project
+):
+    user_client.post(DONATION_URL, json={'full_amount': 100})
+    app.dependency_overrides[current_superuser] = lambda: superuser
+    response = user_client.get(TRACES_URL)
+    assert response.status_code == 200
+    trace = next(
+        trace for trace in response.json()
+        if trace['method'] == 'POST'
+    )
+    assert trace['route'] == '/donation/'
+    assert trace['status'] == 200
+    spans = {(span['name'], span['category']) for span in trace['spans']}
+    assert {
+        ('get_async_session', 'db'),
+        ('create_new_donation', 'handler'),
+        ('allocation', 'allocation'),
+        ('parse', 'validation'),
+        ('validation', 'validation'),
+        ('serialization', 'serialization'),
+    } <= spans, (
+        'Трасса должна содержать спаны зависимостей, обработчика, '
+        'распределения и фаз запроса.'
+    )
+    assert ('INSERT', 'sql') in spans, (
+        'SQL-запросы должны попадать в трассу отдельными спанами.'
+    )
+
+
+@pytest.mark.usefixtures('sample_all')
+def test_traces_chrome_format(user_client, charity_project):
+    user_client.get('/charity_project/')
+    app.dependency_overrides[current_superuser] = lambda: superuser
+    data = user_client.get(
+        TRACES_URL, params={'trace_format': 'chrome'}
+    ).json()
+    events = data['traceEvents']
+    assert events and all(event['ph'] == 'X' for event in events), (
+        'Трассы в формате Chrome должны состоять из событий типа X.'
+    )
+    assert events[0]['name'] == 'GET /charity_project/'
+
+
+def test_traces_forbidden_for_user(user_client):
+    assert user_client.get(TRACES_URL).status_code == 403
@@ -0,0 +1,59 @@
+import pytest
+from conftest import app, get_async_session, override_db
+from fastapi.testclient import TestClient
+
+from app.core.cache import TTLCache
+from app.core.user import token_cache, user_cache
+
+
+@pytest.fixture
+def auth_client():
+    app.dependency_overrides = {get_async_session: override_db}
+    token_cache.clear()
+    user_cache.clear()
+    with TestClient(app) as client:
+        client.post('/auth/register', json={
+            'email': 'dead@pool.com', 'password': 'chimichangas4life'
+        })
+        token = client.post('/auth/jwt/login', data={
+            'username': 'dead@pool.com', 'password': 'chimichangas4life'
+        }).json()['access_token']
+        client.headers['Authorization'] = f'Bearer {token}'
+        yield client
+
+
+def test_authenticated_user_is_cached(auth_client):
+    hits = user_cache.hits
+    for _ in range(3):
+        assert auth_client.get('/donation/my').status_code == 200
+    assert user_cache.hits - hits == 2, (
+        'Повторные запросы с тем же токеном должны брать пользователя '
+        'из кэша.'
+    )
+    assert token_cache.hits >= 2
+    text = auth_client.get('/metrics').text
+    for cache, stats in (('token', token_cache), ('user', user_cache)):
+        assert (
+            f'qrkot_user_cache{{cache="{cache}",stat="hits"}} '
+            f'{stats.hits}'
+        ) in text, 'Счётчики кэшей должны отдаваться в /metrics.'
+
+
+def test_user_cache_invalidated_on_update(auth_client):
+    auth_client.get('/users/me')
+    response = auth_client.patch('/users/me', json={'email': 'new@pool.com'})
+    assert response.status_code == 200
+    assert len(user_cache) == 0, (
+        'Изменение пользователя через /users должно сбрасывать его кэш.'
+    )
+    assert auth_client.get('/users/me').json()['email'] == 'new@pool.com'
+
+
+def test_ttl_cache_evicts_oldest():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert (cache.get('a'), cache.get('b'), cache.get('c')) == (1, None, 3)
+    assert cache.stats() == {'size': 2, 'hits': 3, 'misses': 1}